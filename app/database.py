@@ -1,9 +1,17 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import Session
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from fastapi import Request
 import os
+import time
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from app.utils.dialects import create_tuned_engine
+
+logger = logging.getLogger(__name__)
+
 # DATABASE_URL = (
 #     f"mysql+pymysql://{os.getenv('DB_USER')}:"
 #     f"{os.getenv('DB_PASSWORD')}@"
@@ -13,10 +21,106 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-    
+# Backend specific settings (WAL for SQLite, batched executemany...)
+# live in app/utils/dialects.py
+engine = create_tuned_engine(DATABASE_URL)
+
+
+# Optional read replica for read-only routes (stats, listings).
+# When READ_REPLICA_URL is unset every session goes to the primary.
+READ_REPLICA_URL = os.getenv("READ_REPLICA_URL")
+
+read_engine = (
+    create_tuned_engine(READ_REPLICA_URL, pool_pre_ping=True)
+    if READ_REPLICA_URL else None
+)
+
+# After a write the client is pinned to the primary for a short window,
+# so a user always sees their own changes even if the replica lags.
+PRIMARY_STICKY_COOKIE = "read_primary"
+PRIMARY_STICKY_SECONDS = int(os.getenv("PRIMARY_STICKY_SECONDS", "5"))
+
+# How long to stop trying the replica after it failed
+REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+_replica_down_until = 0.0
+
+
+def mark_primary_sticky(response):
+    """Pin the client to the primary for PRIMARY_STICKY_SECONDS."""
+    response.set_cookie(
+        key=PRIMARY_STICKY_COOKIE,
+        value="1",
+        max_age=PRIMARY_STICKY_SECONDS,
+        httponly=True
+    )
+    return response
+
+
+def _use_replica(request: Request) -> bool:
+    if read_engine is None:
+        return False
+    if request.cookies.get(PRIMARY_STICKY_COOKIE):
+        return False
+    return time.monotonic() >= _replica_down_until
+
+
+def _replica_failed():
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+    logger.warning("Read replica unavailable, using primary")
+
+
+class ReplicaSession(Session):
+    """
+    Read session on the replica that re-runs a failing query on the
+    primary (replica down, or lagging behind a migration: missing tables
+    or columns). Only used for reads, so retrying is safe.
+    """
+
+    def _with_fallback(self, run, *args, **kwargs):
+        try:
+            return run(*args, **kwargs)
+        except (OperationalError, ProgrammingError):
+            if self.bind is engine:
+                raise
+            self.rollback()
+            self.bind = engine
+            _replica_failed()
+            return run(*args, **kwargs)
+
+    # SQLModel's exec() calls Session.execute directly, skipping our
+    # execute(), so both are wrapped (get() and ORM loads use execute())
+    def exec(self, *args, **kwargs):
+        return self._with_fallback(super().exec, *args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._with_fallback(super().execute, *args, **kwargs)
+
 
 def get_session():
     with Session(engine) as session:
         yield session
-    
+
+
+def get_read_session(request: Request):
+    """
+    Session for read-only routes. Uses the replica when configured,
+    falling back to the primary if it is unreachable, a query fails on
+    it, or the client wrote something recently.
+    """
+    if _use_replica(request):
+        session = ReplicaSession(read_engine)
+        try:
+            # Check out a connection now so failures fall back to primary
+            session.connection()
+        except OperationalError:
+            session.close()
+            _replica_failed()
+        else:
+            with session:
+                yield session
+            return
+
+    with Session(engine) as session:
+        yield session
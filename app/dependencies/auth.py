@@ -21,7 +21,7 @@ def get_current_user(
         )
 
     user = session.get(User, int(user_id))
-    if not user:
+    if not user or user.deleted_at:
         raise HTTPException(
             status_code=303,
             headers={"Location": "/user/login"}
@@ -0,0 +1,14 @@
+from fastapi import Header, HTTPException
+import os
+
+from app.utils.security import check_debug_token
+
+
+# Guard for the /debug routes: 404 unless DEBUG_TOKEN is configured,
+# 403 unless the request sends it in X-Debug-Token
+def require_debug_token(x_debug_token: str | None = Header(None)):
+    if not os.getenv("DEBUG_TOKEN"):
+        raise HTTPException(status_code=404)
+
+    if not check_debug_token(x_debug_token):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
@@ -0,0 +1,112 @@
+from fastapi import Depends, Request, HTTPException
+import math
+import os
+import logging
+from app.dependencies.auth import get_current_user
+from app.models import User
+from app.utils import rate_limit as limits
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+
+
+# Bucket keys, used as dependencies so they can come from the resolved user
+# or the submitted form. Never from the raw cookie: a client could rotate it.
+
+def ip_key(request: Request) -> str:
+    host = request.client.host if request.client else "unknown"
+    return f"ip:{host}"
+
+
+async def email_key(request: Request) -> str:
+    """Submitted email, so one account can't be brute forced from many IPs."""
+    form = await request.form()
+    email = str(form.get("email") or "").strip().lower()
+    return f"email:{email}"
+
+
+def user_key(current_user: User = Depends(get_current_user)) -> str:
+    return f"user:{current_user.id}"
+
+
+def rate_limit(scope: str, rate: float, burst: int, key=ip_key):
+    """
+    Dependency: allow `rate` requests per second (bursts up to `burst`)
+    per `key` (a dependency returning the bucket key) for this scope,
+    answer 429 beyond that.
+    """
+    def dependency(client: str = Depends(key)):
+        if not RATE_LIMIT_ENABLED:
+            return
+
+        wait = limits.get_backend().take(f"{scope}:{client}", rate, burst)
+        if wait > 0:
+            limits.record_rejection(scope, "rate_limited")
+            logger.info("Rate limited %s on %s", client, scope)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    return dependency
+
+
+def concurrency_limit(scope: str, limit: int):
+    """
+    Dependency: at most `limit` requests of this scope in flight per process.
+    Extra requests are shed with 503 right away instead of queueing.
+    """
+    limiter = limits.get_limiter(scope, limit)
+
+    def dependency():
+        if not RATE_LIMIT_ENABLED:
+            yield
+            return
+
+        if not limiter.acquire():
+            limits.record_rejection(scope, "shed")
+            logger.info("Shed request on %s (%d in flight)", scope, limiter.in_flight)
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    return dependency
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+# Limits for the expensive routes (Argon2 hashing, stats aggregation and search),
+# used as `dependencies=` on the route decorators
+login_limits = [
+    Depends(rate_limit("login", rate=_env_float("LOGIN_RATE", 10 / 60), burst=int(_env_float("LOGIN_BURST", 5)))),
+    Depends(rate_limit("login", rate=_env_float("LOGIN_RATE", 10 / 60), burst=int(_env_float("LOGIN_BURST", 5)),
+                       key=email_key)),
+    Depends(concurrency_limit("login", int(_env_float("LOGIN_CONCURRENCY", 4)))),
+]
+
+register_limits = [
+    Depends(rate_limit("register", rate=_env_float("REGISTER_RATE", 3 / 60), burst=int(_env_float("REGISTER_BURST", 3)))),
+    Depends(concurrency_limit("register", int(_env_float("REGISTER_CONCURRENCY", 2)))),
+]
+
+stats_limits = [
+    Depends(rate_limit("stats", rate=_env_float("STATS_RATE", 2), burst=int(_env_float("STATS_BURST", 10)),
+                       key=user_key)),
+    Depends(concurrency_limit("stats", int(_env_float("STATS_CONCURRENCY", 8)))),
+]
+
+search_limits = [
+    Depends(rate_limit("search", rate=_env_float("SEARCH_RATE", 2), burst=int(_env_float("SEARCH_BURST", 10)),
+                       key=user_key)),
+    Depends(concurrency_limit("search", int(_env_float("SEARCH_CONCURRENCY", 8)))),
+]
@@ -26,6 +26,23 @@ config.set_main_option("sqlalchemy.url", DATABASE_URL)
 import app.models
 target_metadata = SQLModel.metadata
 
+from app.utils.partitions import ARCHIVE_PREFIX
+from app.utils.search import FTS_TABLE, FTS_OBJECTS
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Skip habitlog partitions and archives (app/utils/partitions.py) and the
+    full-text search structures (app/utils/search.py), they are not models
+    """
+    if not reflected or compare_to is not None:
+        return True
+    if name in FTS_OBJECTS:
+        return False
+    table = object.table.name if type_ == "index" else name
+    if type_ in ("table", "index"):
+        return not table.startswith((ARCHIVE_PREFIX, "habitlog_p", FTS_TABLE))
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +67,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -71,7 +89,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,53 @@
+"""partition habitlog by month and add compacted history tables
+
+Revision ID: 402320104362
+Revises: ab0317d889a8
+Create Date: 2026-10-19 11:03:27.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.partitions import partition_habitlog, unpartition_habitlog
+
+# revision identifiers, used by Alembic.
+revision: str = '402320104362'
+down_revision: Union[str, Sequence[str], None] = 'ab0317d889a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('habitlog_daily',
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('total_minutes', sa.Integer(), nullable=False),
+    sa.Column('log_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['habit_id'], ['habit.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('habit_id', 'user_id', 'date')
+    )
+    op.create_table('habitlog_compaction',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('compacted_before', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_habitlog_habit_user_date', 'habitlog', ['habit_id', 'user_id', 'date'], unique=False)
+
+    # Dialect specific: monthly partitions on Postgres/MySQL,
+    # hot table + habitlog_archive on SQLite (see app/utils/partitions.py)
+    partition_habitlog(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived rows are moved back into habitlog
+    unpartition_habitlog(op.get_bind())
+
+    op.drop_index('ix_habitlog_habit_user_date', table_name='habitlog')
+    op.drop_table('habitlog_compaction')
+    op.drop_table('habitlog_daily')
@@ -0,0 +1,32 @@
+"""add job claims
+
+Revision ID: 8e4b1f6a3c27
+Revises: 5c1e7a9d2b40
+Create Date: 2026-10-20 09:41:27.556102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b1f6a3c27'
+down_revision: Union[str, Sequence[str], None] = '5c1e7a9d2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('job', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    op.add_column('job', sa.Column('slot', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.create_index('ix_job_slot', 'job', ['slot'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_job_slot', table_name='job')
+    op.drop_column('job', 'slot')
+    op.drop_column('job', 'claimed_at')
@@ -0,0 +1,54 @@
+"""add full-text search index over habit names and log notes
+
+Revision ID: a616637f998f
+Revises: 402320104362
+Create Date: 2026-10-19 18:35:37.729379
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.utils.search import create_search_index, drop_search_index, rebuild_index
+
+# revision identifiers, used by Alembic.
+revision: str = 'a616637f998f'
+down_revision: Union[str, Sequence[str], None] = '402320104362'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('search_entry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=True),
+    sa.Column('body', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.ForeignKeyConstraint(['habit_id'], ['habit.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_search_entry_habit_id'), 'search_entry', ['habit_id'], unique=False)
+    op.create_index('ix_search_entry_kind_ref', 'search_entry', ['kind', 'ref_id'], unique=False)
+    op.create_index(op.f('ix_search_entry_user_id'), 'search_entry', ['user_id'], unique=False)
+
+    # Backfill from habits, logs and archived logs, then build the
+    # dialect's full-text index (see app/utils/search.py)
+    rebuild_index(op.get_bind())
+    create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_search_index(op.get_bind())
+
+    op.drop_index(op.f('ix_search_entry_user_id'), table_name='search_entry')
+    op.drop_index('ix_search_entry_kind_ref', table_name='search_entry')
+    op.drop_index(op.f('ix_search_entry_habit_id'), table_name='search_entry')
+    op.drop_table('search_entry')
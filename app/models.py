@@ -1,6 +1,8 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
-from datetime import date
+from datetime import date, datetime
+import datetime as dt
 
 class Habit(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -9,12 +11,49 @@ class Habit(SQLModel, table=True):
     category: Optional[str] = None
 
 class HabitLog(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_habitlog_habit_user_date", "habit_id", "user_id", "date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     habit_id: int = Field(foreign_key="habit.id")
     user_id: int = Field(foreign_key="users.id")
     date: date
     value: int
     note: Optional[str] = None
+
+
+# Daily totals of compacted (archived) history, see app/utils/partitions.py
+class HabitLogDaily(SQLModel, table=True):
+    __tablename__ = "habitlog_daily"
+
+    habit_id: int = Field(foreign_key="habit.id", primary_key=True)
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    date: dt.date = Field(primary_key=True)  # module alias, the field name shadows `date`
+    total_minutes: int
+    log_count: int
+
+# Single row: logs before compacted_before live in habitlog_daily / archives
+class HabitLogCompaction(SQLModel, table=True):
+    __tablename__ = "habitlog_compaction"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    compacted_before: date
+    
+# Searchable text (habit names, log notes), indexed by app/utils/search.py
+class SearchEntry(SQLModel, table=True):
+    __tablename__ = "search_entry"
+    __table_args__ = (
+        Index("ix_search_entry_kind_ref", "kind", "ref_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str  # habit | log
+    ref_id: int  # habit.id or habitlog.id
+    habit_id: int = Field(foreign_key="habit.id", index=True)
+    user_id: int = Field(foreign_key="users.id", index=True)
+    date: Optional[dt.date] = None
+    body: str
     
 class User(SQLModel, table=True):
     __tablename__ = "users" # Because sqlite3 to mysql conversion
@@ -23,4 +62,21 @@ class User(SQLModel, table=True):
     username: str
     email: str
     hashed_password: str
-    
\ No newline at end of file
+    deleted_at: Optional[datetime] = None  # set on account deletion, until purge_user runs
+
+
+class JobRecord(SQLModel, table=True):
+    __tablename__ = "job"
+    __table_args__ = (
+        Index("ix_job_slot", "slot", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    payload: str   # JSON encoded task kwargs
+    status: str = Field(default="pending", index=True)  # pending | running | done | failed
+    attempts: int = 0
+    created_at: datetime
+    claimed_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    slot: Optional[str] = None  # periodic runs: one row per run across processes
@@ -0,0 +1,63 @@
+from dataclasses import asdict
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from app.dependencies.debug import require_debug_token
+from app.utils.profiling import profiler
+from app.utils import rate_limit as limits
+from app.utils.jobs import scheduler
+
+# Getting data models from schemas
+import app.schemas as schemas
+
+# Create a Router instance, every route needs the debug token
+router = APIRouter(dependencies=[Depends(require_debug_token)], include_in_schema=False)
+
+
+# Profiling settings, per-route summary and the latest records
+@router.get("/debug/profiling")
+def profiling_status(route: str | None = None, limit: int = 20):
+    records = [r for r in reversed(profiler.records) if route is None or r.route == route]
+    return {
+        "settings": asdict(profiler.settings),
+        "routes": profiler.summary(),
+        "records": [asdict(r) for r in records[:limit]],
+    }
+
+# Change settings without a restart (e.g. {"sample_rate": 0} turns sampling off)
+@router.post("/debug/profiling")
+def update_profiling(changes: schemas.ProfileSettingsUpdate):
+    for name, value in changes.model_dump(exclude_none=True).items():
+        setattr(profiler.settings, name, value)
+    return asdict(profiler.settings)
+
+@router.post("/debug/profiling/clear")
+def clear_profiling():
+    profiler.clear()
+    return {"records": 0}
+
+@router.get("/debug/profiling/{record_id}")
+def profiling_record(record_id: int):
+    record = profiler.get(record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return asdict(record)
+
+# Download a dump: `prof` (pstats) or `tracemalloc` (Snapshot.load)
+@router.get("/debug/profiling/{record_id}/{kind}")
+def profiling_dump(record_id: int, kind: str):
+    record = profiler.get(record_id)
+    if record is None or kind not in record.files:
+        raise HTTPException(status_code=404, detail="Dump not found")
+    path = record.files[kind]
+    return FileResponse(path, media_type="application/octet-stream", filename=path.rsplit("/", 1)[-1])
+
+
+# Rejections (429 / 503) and requests in flight per rate limited scope
+@router.get("/debug/rate-limits")
+def rate_limit_metrics():
+    return limits.metrics()
+
+# Background job queue depth and per-task wait/run latency
+@router.get("/debug/jobs")
+def job_stats():
+    return scheduler.snapshot()
@@ -2,6 +2,11 @@ from fastapi import APIRouter, Depends
 from sqlmodel import Session, text, select
 from app.models import User, Habit, HabitLog
 from app.dependencies.auth import get_current_user
+from app.utils.profiling import ProfiledRoute
+from app.utils.history_cache import history_cache
+from app.utils.partitions import delete_history
+from app.utils.dialects import bulk_delete
+from app.utils import search
 
 # For templates and forms
 from fastapi.templating import Jinja2Templates
@@ -11,13 +16,13 @@ from fastapi import Request, Form
 templates = Jinja2Templates(directory="app/templates")
 
 # Create a Router instance
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # Getting data models from schemas
 import app.schemas as schemas
 
 # Access data from the database(sql) for CRUD operations
-from app.database import get_session
+from app.database import get_session, get_read_session
 
 
 # Create habit via form
@@ -47,6 +52,8 @@ def create_habit(
     db_habit = Habit(**db_habit.model_dump())
     
     session.add(db_habit)
+    session.flush()
+    search.index_habit(session, db_habit)
     session.commit()
     session.refresh(db_habit)
 
@@ -61,7 +68,7 @@ def habit_form_guard():
 def habits_page(
     request: Request, 
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
 
     flash_message = request.cookies.get("flash")
@@ -69,17 +76,27 @@ def habits_page(
     user_id = current_user.id
     username = session.get(User, user_id).username
 
-    count_stmt = text("SELECT COUNT(*) FROM habit WHERE user_id = :user_id")
-    total_habit = session.scalar(count_stmt, params={"user_id": user_id})
-
-    count_log_per_habit = text('''SELECT h.id, h.name, h.category, COUNT(hl.id) AS log_count
+    # Counts are aggregated per habit before the join, so the habitlog
+    # (habit_id, user_id, date) index is used and the habit rows are not
+    # grouped; compacted history contributes its stored log counts
+    count_log_per_habit = text('''SELECT h.id, h.name, h.category,
+                                      COALESCE(hot.log_count, 0) + COALESCE(cold.log_count, 0) AS log_count
                                FROM habit AS h
-                               LEFT JOIN habitlog AS hl
-                               ON h.id = hl.habit_id
+                               LEFT JOIN (SELECT habit_id, COUNT(*) AS log_count
+                                          FROM habitlog
+                                          WHERE user_id = :user_id
+                                          GROUP BY habit_id) AS hot
+                               ON hot.habit_id = h.id
+                               LEFT JOIN (SELECT habit_id, SUM(log_count) AS log_count
+                                          FROM habitlog_daily
+                                          WHERE user_id = :user_id
+                                          GROUP BY habit_id) AS cold
+                               ON cold.habit_id = h.id
                                WHERE h.user_id = :user_id
-                               GROUP BY h.id, h.name, h.category
+                               ORDER BY h.id
                                ''')
     habits = session.exec(count_log_per_habit, params={"user_id": user_id}).all()
+    total_habit = len(habits)
     
     response = templates.TemplateResponse(
         "habits.html",
@@ -113,12 +130,14 @@ def delete_habit(
         return response
     
     # Delete associated logs first
-    logs = session.exec(select(HabitLog).where(HabitLog.habit_id == habit_id)).all()
-    for log in logs:
-        session.delete(log)
+    bulk_delete(session, HabitLog, HabitLog.habit_id == habit_id)
+    delete_history(session, habit_id=habit_id)
+    search.unindex(session, habit_id=habit_id)
         
     session.delete(habit)
     session.commit()
     
+    history_cache.invalidate(habit_id=habit_id)
+    
     return RedirectResponse(url=f"/habits", status_code=303)
 
@@ -1,33 +1,38 @@
 from fastapi import APIRouter, Depends
-from datetime import date
-from sqlmodel import Session, select, func
+from datetime import date, timedelta
+from sqlmodel import Session, select
 from app.database import engine
 from app.models import User, Habit, HabitLog
 from app.utils import stats_func as stats
+from app.utils.history_cache import history_cache, heatmap_weeks
+from app.utils.partitions import HOT_MONTHS, add_months, daily_totals, first_log_date, get_boundary, month_start
+from app.utils import search
 from app.dependencies.auth import get_current_user
+from app.utils.profiling import ProfiledRoute
+from app.dependencies.rate_limit import stats_limits
 
 # For templates and forms
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse
-from fastapi import Request, Form
+from fastapi import Request, Form, Query
 
 templates = Jinja2Templates(directory="app/templates")
 
 # Create a Router instance
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # Getting data models from schemas
 import app.schemas as schemas
 
 # Access data from the database(sql) for CRUD operations
-from app.database import get_session
+from app.database import get_session, get_read_session
 
 
 # Create habit log via form
 @router.post("/habits/{habit_id}/form")
 def create_habitlog(
     habit_id: int,
-    value: int = Form(...),
+    value: int = Form(..., ge=0, le=schemas.MAX_LOG_VALUE),
     note: str | None = Form(None),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -44,9 +49,13 @@ def create_habitlog(
     log = HabitLog(**log.model_dump())
     
     session.add(log)
+    session.flush()
+    search.index_log(session, log)
     session.commit()
     session.refresh(log)
     
+    history_cache.add(habit_id, user_id, log.date, log.value)
+    
     return RedirectResponse(url=f"/habits/{habit_id}/log", status_code=303)
 
 # View logs for a specific habit
@@ -54,31 +63,34 @@ def create_habitlog(
 def habitlog_page(
     habit_id: int,
     request: Request,
+    days: int = 90,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     user_id = current_user.id
     
     habit = session.get(Habit, habit_id)
     
-    logs = session.exec(
-        select(HabitLog).where(
-            HabitLog.habit_id == habit_id,
-            HabitLog.user_id == user_id
-        ).order_by(HabitLog.date.desc())
-    ).all()
+    # Individual logs are only listed for the hot window (before the
+    # first compaction too, so older partitions are never read), older
+    # history is shown through its daily totals
+    boundary = get_boundary(session) or add_months(month_start(date.today()), -HOT_MONTHS)
     
-    stmt = (
-        select(
-            HabitLog.date,
-            func.sum(HabitLog.value).label("total_value")
-        )
-        .where(HabitLog.habit_id == habit_id)
-        .where(HabitLog.user_id == user_id)
-        .group_by(HabitLog.date)
+    # Plain rows with only the columns the page shows, not ORM objects
+    # tracked by the session (memory grows with the account's history)
+    stmt = select(HabitLog.id, HabitLog.date, HabitLog.value, HabitLog.note).where(
+        HabitLog.habit_id == habit_id,
+        HabitLog.user_id == user_id
+    )
+    logs = session.exec(stmt.where(HabitLog.date >= boundary).order_by(HabitLog.date.desc())).all()
+    
+    # Daily summaries for the last `days` only, so older partitions
+    # and compacted history are not read
+    days = min(max(days, 1), 3660)
+    grouped_logs = daily_totals(
+        session, [habit_id], user_id,
+        start=date.today() - timedelta(days=days - 1)
     )
-    result = session.exec(stmt).all()
-    grouped_logs = list(result)
     
     return templates.TemplateResponse(
         "logs.html",
@@ -86,18 +98,20 @@ def habitlog_page(
             "request": request, "habit": habit, 
             "logs": logs, 
             "grouped_logs": grouped_logs,
+            "days": days,
             "user_id": user_id
         }
     )
 
 
 # View weekly stats for a specific habit
-@router.get("/habits/{habit_id}/stats")
+@router.get("/habits/{habit_id}/stats", dependencies=stats_limits)
 def get_stats(
     habit_id: int,
     request: Request,
+    days: int = 365,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     user_id = current_user.id
     # Get habit details
@@ -106,9 +120,7 @@ def get_stats(
     # Calculate weekly stats
     week_day = 7
     
-    start_date_check = session.exec(
-        select(func.min(HabitLog.date)).where(HabitLog.habit_id == habit_id, HabitLog.user_id == user_id)
-    ).first()
+    start_date_check = first_log_date(session, habit_id, user_id)
     
     if not start_date_check or not stats.check_data_sufficiency(
         first_day=start_date_check, 
@@ -142,16 +154,62 @@ def get_stats(
         avg_per_day=avg_per_day
     ))
     
+    # Long-range heatmap, served from the in-memory history cache
+    days = min(max(days, week_day), 3660)
+    heatmap_start = date.today() - timedelta(days=days - 1)
+    history = history_cache.range(habit_id, user_id, heatmap_start, date.today())
+    
     return templates.TemplateResponse(
         "stats.html",
         {
             "request": request, "habit": habit,
             "weekly_stats": weekly_stats,
+            "heatmap": heatmap_weeks(history, heatmap_start),
+            "heatmap_days": days,
             "user_id": user_id
         }
     )
     
 
+# Compare stats across several (default: all) habits
+@router.get("/habits/stats", dependencies=stats_limits)
+def get_stats_batch(
+    request: Request,
+    habit_id: list[int] | None = Query(None),
+    days: int = 7,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session)
+):
+    user_id = current_user.id
+    days = min(max(days, 1), 3660)
+    
+    all_habits = session.exec(
+        select(Habit).where(Habit.user_id == user_id).order_by(Habit.id)
+    ).all()
+    selected = set(habit_id or [h.id for h in all_habits])
+    habits = [h for h in all_habits if h.id in selected]
+    
+    batch = stats.prepare_stats_batch(
+        session=session,
+        habits=habits,
+        user_id=user_id,
+        required_days=days
+    )
+    
+    return templates.TemplateResponse(
+        "compare.html",
+        {
+            "request": request,
+            "all_habits": all_habits,
+            "selected": selected,
+            "batch": batch,
+            "days": days,
+            "max_total": max((s.total_week for s in batch), default=0),
+            "user_id": user_id
+        }
+    )
+
+
 # Delete a specific log
 @router.post("/logs/{log_id}/delete")
 def delete_log(
@@ -162,7 +220,11 @@ def delete_log(
     log = session.get(HabitLog, log_id)
 
     habit_id = log.habit_id
+    user_id, log_date, value = log.user_id, log.date, log.value
     session.delete(log)
+    search.unindex_log(session, log_id)
     session.commit()
     
+    history_cache.add(habit_id, user_id, log_date, -value)
+    
     return RedirectResponse(url=f"/habits/{habit_id}/log", status_code=303)
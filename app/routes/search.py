@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends
+from sqlmodel import Session
+from app.models import User
+from app.utils import search
+from app.dependencies.auth import get_current_user
+from app.utils.profiling import ProfiledRoute
+from app.dependencies.rate_limit import search_limits
+
+# For templates and forms
+from fastapi.templating import Jinja2Templates
+from fastapi import Request
+
+templates = Jinja2Templates(directory="app/templates")
+
+# Create a Router instance
+router = APIRouter(route_class=ProfiledRoute)
+
+# Access data from the database(sql) for CRUD operations
+from app.database import get_read_session
+
+
+# Full-text search over the user's habit names and log notes
+@router.get("/search", dependencies=search_limits)
+def search_page(
+    request: Request,
+    q: str = "",
+    page: int = 1,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_read_session)
+):
+    user_id = current_user.id
+    page = max(page, 1)
+    
+    hits, has_next = search.search(session, user_id, q, page=page)
+    
+    return templates.TemplateResponse(
+        "search.html",
+        {
+            "request": request,
+            "q": q,
+            "hits": hits,
+            "page": page,
+            "has_next": has_next,
+            "user_id": user_id
+        }
+    )
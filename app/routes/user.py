@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends
+from datetime import datetime
 from sqlmodel import Session, select
-from app.models import User, Habit, HabitLog
+from app.models import User
 from app.dependencies.auth import get_current_user
+from app.utils.profiling import ProfiledRoute
 from app.utils.security import verify_password, hash_password
+from app.utils.jobs import scheduler
+from app.dependencies.rate_limit import login_limits, register_limits
 
 # For templates and forms
 from fastapi.templating import Jinja2Templates
@@ -12,7 +16,7 @@ from fastapi import Request, Form
 templates = Jinja2Templates(directory="app/templates")
 
 # Create a Router instance
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # Getting data models from schemas
 import app.schemas as schemas
@@ -21,7 +25,7 @@ import app.schemas as schemas
 from app.database import get_session
 
 # Create/Register a new user
-@router.post("/user/register/form")
+@router.post("/user/register/form", dependencies=register_limits)
 def create_user(
     username: str = Form(...),
     email: str = Form(...),
@@ -80,7 +84,7 @@ def get_user(request: Request):
         }
     )
     
-@router.post("/user/login/form")
+@router.post("/user/login/form", dependencies=login_limits)
 def login_user(
     email: str = Form(...),
     password: str = Form(...),
@@ -94,7 +98,8 @@ def login_user(
     stmt1 = select(User).where(User.email == email)
     user = session.exec(stmt1).first()
     
-    if not user:
+    # Deleted accounts wait for their purge job
+    if not user or user.deleted_at:
         response = RedirectResponse(url="/user/login", status_code=303)
         response.set_cookie(key="error_login", value="User not found", max_age=3)
         return response
@@ -104,6 +109,9 @@ def login_user(
         response.set_cookie(key="error_login", value="Invalid password", max_age=3)
         return response
     
+    # Warm the stats history cache in the background
+    scheduler.enqueue("warm_history", user_id=user.id)
+    
     # Adding cookie or session management can be done here
     response = RedirectResponse(url=f"/{user.id}/account", status_code=303)
     response.set_cookie(
@@ -162,21 +170,22 @@ def delete_user(
 ):
     """
     Delete a user and all associated habits and logs.
+    The account is disabled right away, the purge itself runs as a
+    (persisted) background job.
     """
     user_id = current_user.id
     
-    user = session.get(User, user_id)
-    
-    # Delete associated habits and logs
-    habits = session.exec(select(Habit).where(Habit.user_id == user_id)).all()
-    for habit in habits:
-        logs = session.exec(select(HabitLog).where(HabitLog.habit_id == habit.id)).all()
-        for log in logs:
-            session.delete(log)
-        session.delete(habit)
-        
-    session.delete(user)
+    # The purge job is committed together with deleted_at, a disabled
+    # account always has its job
+    current_user.deleted_at = datetime.now()
+    session.add(current_user)
+    purge = scheduler.stage(session, "purge_user", user_id=user_id)
     session.commit()
     
-    return RedirectResponse(url="/user/login", status_code=303)
+    scheduler.submit(purge)
+    
+    response = RedirectResponse(url="/user/login", status_code=303)
+    response.delete_cookie(key="user_id")
+    
+    return response
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date, datetime
 from typing import Optional, List
 
@@ -10,11 +10,14 @@ class HabitCreate(BaseModel):
 class HabitRead(BaseModel):
     id: int
     
+# A log is a duration in minutes, at most one day
+MAX_LOG_VALUE = 24 * 60
+
 class HabitLogCreate(BaseModel):
     user_id: int
     habit_id: int
     date: date
-    value: int
+    value: int = Field(ge=0, le=MAX_LOG_VALUE)
     note: Optional[str] = None
     
     model_config = ConfigDict(
@@ -49,8 +52,9 @@ class WeeklyStats(BaseModel):
     habit_name: str
     # daily aggregations for the last 7 days(fill 0 for missing days)
     daily: List[DailyAggregation]
-    total_week: int
+    total_week: int   # total over the whole window
     avg_per_day: float
+    days: int = 7
     
 
 class UserCreate(BaseModel):
@@ -66,3 +70,12 @@ class UserRead(BaseModel):
 class UserLogin(BaseModel):
     username: str
     password: str
+
+
+# Runtime changes to request profiling, see app/utils/profiling.py
+class ProfileSettingsUpdate(BaseModel):
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    cprofile: Optional[bool] = None
+    dump: Optional[bool] = None
+    frames: Optional[int] = Field(None, ge=1, le=100)
+    top: Optional[int] = Field(None, ge=1, le=100)
@@ -0,0 +1,53 @@
+# Background tasks, run by app.utils.jobs.scheduler
+import os
+
+from sqlmodel import Session, select, delete
+
+from app.database import engine
+from app.models import User, Habit, HabitLog
+from app.utils.history_cache import history_cache
+from app.utils.jobs import scheduler
+from app.utils import partitions, search
+from app.utils.dialects import bulk_delete
+
+
+# Always persisted: the account is only marked deleted until this runs
+@scheduler.task("purge_user", retries=5, durable=True)
+def purge_user(user_id: int):
+    """Delete a user with all their habits and logs."""
+    user_habits = select(Habit.id).where(Habit.user_id == user_id)
+
+    with Session(engine) as session:
+        bulk_delete(session, HabitLog, HabitLog.habit_id.in_(user_habits) | (HabitLog.user_id == user_id))
+        partitions.delete_history(session, user_id=user_id)
+        search.unindex(session, user_id=user_id)
+        bulk_delete(session, Habit, Habit.user_id == user_id)
+        session.exec(delete(User).where(User.id == user_id))
+        session.commit()
+
+    history_cache.invalidate(user_id=user_id)
+
+
+@scheduler.task("warm_history", retries=0)
+def warm_history(user_id: int):
+    """Load a user's habit histories into the cache ahead of their first stats view."""
+    with Session(engine) as session:
+        habit_ids = session.exec(select(Habit.id).where(Habit.user_id == user_id)).all()
+
+    for habit_id in habit_ids:
+        history_cache.get(habit_id, user_id)
+
+
+@scheduler.task("maintain_partitions", retries=3, retry_delay=60)
+def maintain_partitions():
+    """
+    Nightly: create upcoming habitlog partitions and roll cold history up
+    into habitlog_daily, the stored daily totals stats read it from.
+    """
+    partitions.ensure_partitions(engine)
+    if partitions.compact_history(engine):
+        # Compacted ranges now come from habitlog_daily
+        history_cache.invalidate()
+
+
+scheduler.daily("maintain_partitions", hour=int(os.getenv("NIGHTLY_JOBS_HOUR", "3")))
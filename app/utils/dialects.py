@@ -0,0 +1,138 @@
+# Per-backend performance profiles and dialect-optimised write helpers
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlmodel import delete
+
+DB_TUNING = os.getenv("DB_TUNING", "1") == "1"
+
+# SQLite page cache and memory map sizes
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+# Rows per batched executemany / streamed chunk / MySQL delete batch
+BATCH_SIZE = 1000
+
+
+def _sqlite_profile(engine):
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the single writer, NORMAL sync is
+        # safe in WAL mode (only the last commits can be lost on power failure)
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+PROFILES = {
+    "sqlite": {
+        "options": {},
+        "setup": _sqlite_profile,
+    },
+    "postgresql": {
+        "options": {
+            # INSERTs already go out as multi-row VALUES (insertmanyvalues,
+            # 1000 rows per statement by default); other executemany
+            # statements (UPDATE/DELETE) use execute_batch instead of one
+            # round trip per row
+            "executemany_mode": "values_plus_batch",
+            "executemany_batch_page_size": BATCH_SIZE,
+            "pool_pre_ping": True,
+        },
+        "setup": None,
+    },
+    "mysql": {
+        # Connection settings only: PyMySQL already rewrites executemany
+        # INSERTs into multi-row statements
+        "options": {
+            # MySQL drops idle connections after wait_timeout
+            "pool_recycle": 3600,
+            "pool_pre_ping": True,
+        },
+        "setup": None,
+    },
+}
+
+
+def create_tuned_engine(url: str, **kwargs):
+    """create_engine with the backend's profile applied (unless DB_TUNING=0)."""
+    dialect = make_url(url).get_backend_name()
+    profile = PROFILES.get(dialect) if DB_TUNING else None
+    if profile is None:
+        return create_engine(url, **kwargs)
+
+    engine = create_engine(url, **{**profile["options"], **kwargs})
+    if profile["setup"] is not None:
+        profile["setup"](engine)
+    return engine
+
+
+def stream(conn, stmt, batch_size: int = BATCH_SIZE):
+    """
+    Iterate a large result in chunks of rows without loading it all.
+    Uses server-side cursors on Postgres (named cursor) and MySQL (SSCursor),
+    on MySQL the connection cannot run anything else until it is consumed.
+    """
+    result = conn.execute(stmt.execution_options(yield_per=batch_size))
+    yield from result.partitions()
+
+
+def _sqlite_upsert(table, keys, columns):
+    from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(index_elements=keys, set_={c: stmt.excluded[c] for c in columns})
+
+def _pg_upsert(table, keys, columns):
+    from sqlalchemy.dialects.postgresql import insert
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(index_elements=keys, set_={c: stmt.excluded[c] for c in columns})
+
+def _mysql_upsert(table, keys, columns):
+    from sqlalchemy.dialects.mysql import insert
+    stmt = insert(table)
+    return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in columns})
+
+
+def upsert(session, model, rows: list[dict], keys: list[str]):
+    """
+    Insert rows, overwriting the non-key columns of rows that already exist.
+    ON CONFLICT DO UPDATE on SQLite/Postgres, ON DUPLICATE KEY UPDATE on MySQL.
+    """
+    if not rows:
+        return
+
+    columns = [c for c in rows[0] if c not in keys]
+    stmt = {
+        "sqlite": _sqlite_upsert,
+        "postgresql": _pg_upsert,
+        "mysql": _mysql_upsert,
+    }[session.get_bind().dialect.name](model.__table__, keys, columns)
+
+    for i in range(0, len(rows), BATCH_SIZE):
+        session.execute(stmt, rows[i:i + BATCH_SIZE])
+
+
+def bulk_delete(session, model, *criteria, batch_size: int = 10_000) -> int:
+    """
+    DELETE matching rows with a single statement instead of loading them.
+    On MySQL large deletes run in LIMITed batches to keep row locks and
+    undo log small. Returns the number of rows deleted.
+    """
+    stmt = delete(model).where(*criteria)
+
+    if session.get_bind().dialect.name != "mysql":
+        return session.exec(stmt).rowcount
+
+    total = 0
+    stmt = stmt.with_dialect_options(mysql_limit=batch_size)
+    while True:
+        deleted = session.exec(stmt).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
@@ -0,0 +1,199 @@
+# In-process cache of per-habit daily totals for long-range charts
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from sqlmodel import Session
+
+from app.utils.partitions import daily_totals
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead (dict slot, dataclass, array header) in bytes
+ENTRY_OVERHEAD = 200
+
+
+@dataclass
+class HabitHistory:
+    """Daily totals as one int64 per day, totals[0] is `start`."""
+    start: date
+    totals: array = field(default_factory=lambda: array("q"))
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=len(self.totals) - 1)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.totals) * self.totals.itemsize + ENTRY_OVERHEAD
+
+    def add(self, day: date, delta: int):
+        if not self.totals:
+            self.start = day
+            self.totals.append(0)
+        elif day < self.start:
+            self.totals[0:0] = _zeros((self.start - day).days)
+            self.start = day
+        elif day > self.end:
+            self.totals.extend(_zeros((day - self.end).days))
+        self.totals[(day - self.start).days] += delta
+
+    def range(self, start: date, end: date) -> list[int]:
+        """Totals for start..end inclusive, 0 for days outside the history."""
+        days = max((end - start).days + 1, 0)
+        values = [0] * days
+        offset = (start - self.start).days
+        lo = max(offset, 0)
+        hi = min(offset + days, len(self.totals))
+        if lo < hi:
+            values[lo - offset:hi - offset] = self.totals[lo:hi].tolist()
+        return values
+
+
+class HistoryCache:
+    """
+    LRU cache of HabitHistory keyed by (habit_id, user_id), bounded by
+    memory. Writes patch cached entries in place; entries also expire
+    after `ttl` seconds since other workers cannot patch this process.
+    """
+
+    def __init__(self, engine, max_bytes: int, ttl: float):
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._entries: OrderedDict[tuple[int, int], HabitHistory] = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> [loads in flight, writes seen], so a load racing a write
+        # to the same key is not cached (only kept while loads are running)
+        self._loading: dict[tuple[int, int], list[int]] = {}
+
+    def _load(self, habit_id: int, user_id: int) -> HabitHistory:
+        # Always load from the primary so a lagging replica is never cached
+        with Session(self.engine) as session:
+            rows = [(r.date, r.total_minutes) for r in daily_totals(session, [habit_id], user_id)]
+
+        if not rows:
+            return HabitHistory(start=date.today())
+
+        history = HabitHistory(start=rows[0][0])
+        history.totals = _zeros((rows[-1][0] - history.start).days + 1)
+        for day, total in rows:
+            history.totals[(day - history.start).days] = total
+        return history
+
+    def get(self, habit_id: int, user_id: int) -> HabitHistory:
+        key = (habit_id, user_id)
+        with self._lock:
+            history = self._entries.get(key)
+            if history is not None and time.monotonic() - history.loaded_at < self.ttl:
+                self._entries.move_to_end(key)
+                return history
+            loading = self._loading.setdefault(key, [0, 0])
+            loading[0] += 1
+            seq = loading[1]
+
+        history = None
+        try:
+            history = self._load(habit_id, user_id)
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if not loading[0]:
+                    del self._loading[key]
+                if history is not None and seq == loading[1]:
+                    self._drop(key)
+                    self._entries[key] = history
+                    self.nbytes += history.nbytes
+                    self._evict()
+        return history
+
+    def range(self, habit_id: int, user_id: int, start: date, end: date) -> list[int]:
+        history = self.get(habit_id, user_id)
+        with self._lock:
+            return history.range(start, end)
+
+    def add(self, habit_id: int, user_id: int, day: date, delta: int):
+        """Apply a logged (or deleted, with negative delta) value to a cached entry."""
+        key = (habit_id, user_id)
+        with self._lock:
+            self._written(key)
+            history = self._entries.get(key)
+            if history is None:
+                return
+            self.nbytes -= history.nbytes
+            try:
+                history.add(day, delta)
+            except Exception:
+                # The write is already committed, drop the entry and reload it later
+                logger.exception("Could not update cached history of habit %s", habit_id)
+                del self._entries[key]
+                return
+            self.nbytes += history.nbytes
+            self._evict()
+
+    def invalidate(self, habit_id: int | None = None, user_id: int | None = None):
+        """Drop entries matching habit_id and/or user_id (all if neither given)."""
+        def matches(key):
+            return (habit_id is None or key[0] == habit_id) and (user_id is None or key[1] == user_id)
+
+        with self._lock:
+            for key in list(self._loading):
+                if matches(key):
+                    self._written(key)
+            for key in list(self._entries):
+                if matches(key):
+                    self._drop(key)
+
+    def _written(self, key):
+        loading = self._loading.get(key)
+        if loading is not None:
+            loading[1] += 1
+
+    def _drop(self, key):
+        history = self._entries.pop(key, None)
+        if history is not None:
+            self.nbytes -= history.nbytes
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, history = self._entries.popitem(last=False)
+            self.nbytes -= history.nbytes
+
+
+def _zeros(days: int) -> array:
+    return array("q", bytes(8 * days))
+
+
+def _build_cache() -> HistoryCache:
+    from app.database import engine
+    return HistoryCache(
+        engine=engine,
+        max_bytes=int(os.getenv("HISTORY_CACHE_BYTES", 8 * 1024 * 1024)),
+        ttl=float(os.getenv("HISTORY_CACHE_TTL", 300)),
+    )
+
+
+history_cache = _build_cache()
+
+
+def heatmap_weeks(values: list[int], start: date) -> list[list[dict]]:
+    """
+    Group daily totals into week columns (Monday first) for the heatmap.
+    Each cell has date, total and a 0-4 intensity level.
+    """
+    peak = max(values, default=0)
+    weeks = []
+    for i, total in enumerate(values):
+        day = start + timedelta(days=i)
+        if not weeks or day.weekday() == 0:
+            weeks.append([None] * day.weekday())
+        level = 0 if total <= 0 or peak <= 0 else min(4, 1 + (4 * total - 1) // peak)
+        weeks[-1].append({"date": day, "total": total, "level": level})
+    return weeks
@@ -0,0 +1,371 @@
+# In-process background jobs: deferred work, retries and periodic tasks
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Task:
+    name: str
+    func: Callable
+    retries: int = 3
+    retry_delay: float = 1.0    # doubled after every failed attempt
+    durable: bool = False       # always persisted, whatever JOBS_DURABLE says
+
+
+@dataclass
+class Job:
+    id: int
+    name: str
+    kwargs: dict
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    db_id: int | None = None    # row in the job table when durable
+
+
+@dataclass
+class TaskStats:
+    completed: int = 0
+    failed: int = 0
+    retried: int = 0
+    total_wait: float = 0.0
+    total_run: float = 0.0
+    max_wait: float = 0.0
+    max_run: float = 0.0
+
+
+class JobScheduler:
+    """
+    Runs registered tasks on a small pool of asyncio workers (sync task
+    functions run in threads). Started and stopped by the FastAPI lifespan;
+    before that, enqueued jobs simply run inline.
+    """
+
+    def __init__(self, workers: int = 2, durable: bool = False):
+        self.workers = workers
+        self.durable = durable
+        self.tasks: dict[str, Task] = {}
+        self.stats: dict[str, TaskStats] = defaultdict(TaskStats)
+        self.running = 0
+        self.delayed = 0
+        self._ids = itertools.count(1)
+        self._periodic: list[tuple[str, float, float]] = []
+        self._daily: list[tuple[str, int, int]] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+
+    # Registration
+
+    def task(self, name: str, retries: int = 3, retry_delay: float = 1.0, durable: bool = False):
+        """Decorator registering a function as a task that can be enqueued by name."""
+        def register(func):
+            self.tasks[name] = Task(name, func, retries, retry_delay, durable)
+            return func
+        return register
+
+    def every(self, name: str, interval: float, first_delay: float | None = None):
+        """Run task `name` every `interval` seconds while the app is up."""
+        self._periodic.append((name, interval, interval if first_delay is None else first_delay))
+
+    def daily(self, name: str, hour: int, minute: int = 0):
+        """Run task `name` once a day at the given local time."""
+        self._daily.append((name, hour, minute))
+
+    # Enqueueing (safe to call from sync route handlers)
+
+    def enqueue(self, name: str, **kwargs) -> Job:
+        task = self.tasks.get(name)
+        return self._enqueue(name, kwargs, durable=self.durable or (task is not None and task.durable))
+
+    def _enqueue(self, name: str, kwargs: dict, durable: bool) -> Job:
+        if name not in self.tasks:
+            raise KeyError(f"Unknown task: {name}")
+
+        job = Job(id=next(self._ids), name=name, kwargs=kwargs)
+        if durable:
+            job.db_id = _store_job(name, kwargs)
+        self._dispatch(job)
+        return job
+
+    def stage(self, session, name: str, **kwargs):
+        """
+        Add a durable job to the caller's session, so it is committed (or
+        rolled back) with the caller's own writes. Pass the returned
+        record to submit() once committed.
+        """
+        if name not in self.tasks:
+            raise KeyError(f"Unknown task: {name}")
+        from app.models import JobRecord
+
+        record = JobRecord(name=name, payload=json.dumps(kwargs), status="pending", created_at=datetime.now())
+        session.add(record)
+        return record
+
+    def submit(self, record) -> Job:
+        """Run a job staged with stage() after its transaction committed."""
+        job = Job(id=next(self._ids), name=record.name, kwargs=json.loads(record.payload), db_id=record.id)
+        self._dispatch(job)
+        return job
+
+    def _dispatch(self, job: Job):
+        if self._loop is None:
+            self._run_inline(job)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+    def _run_inline(self, job: Job):
+        task = self.tasks[job.name]
+        if not _claim_job(job):
+            return
+        job.attempts += 1
+        start = time.monotonic()
+        try:
+            task.func(**job.kwargs)
+        except Exception:
+            self.stats[job.name].failed += 1
+            logger.exception("Job %s failed", job.name)
+            _update_job(job, "failed")
+            raise
+        self._record(job, start, time.monotonic())
+        _update_job(job, "done")
+
+    # Lifecycle
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        periodic = self._periodic + [
+            (name, 24 * 60 * 60, _seconds_until(hour, minute)) for name, hour, minute in self._daily
+        ]
+        self._workers += [
+            asyncio.create_task(self._repeat(name, interval, first_delay))
+            for name, interval, first_delay in periodic
+        ]
+        # Durable tasks may have pending jobs even without JOBS_DURABLE
+        if self.durable or any(task.durable for task in self.tasks.values()):
+            for job in await asyncio.to_thread(_load_pending_jobs, self._ids):
+                if job.name in self.tasks:
+                    self._queue.put_nowait(job)
+                else:
+                    logger.warning("Skipping pending job for unknown task %s", job.name)
+
+    async def stop(self, timeout: float = 10.0):
+        """Wait (up to timeout) for queued jobs, then cancel the workers."""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Stopping with %d jobs still queued", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+        self._queue = None
+
+    async def _repeat(self, name: str, interval: float, first_delay: float):
+        await asyncio.sleep(first_delay)
+        while True:
+            # Every app process ticks; only the one that records this
+            # run's slot in the job table enqueues it
+            slot = f"{name}@{int(time.time() // interval)}"
+            db_id = await asyncio.to_thread(_store_slot, name, slot)
+            if db_id is not None:
+                self._queue.put_nowait(Job(id=next(self._ids), name=name, kwargs={}, db_id=db_id))
+            await asyncio.sleep(interval)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Job):
+        task = self.tasks[job.name]
+        if not await asyncio.to_thread(_claim_job, job):
+            return
+        job.attempts += 1
+        start = time.monotonic()
+        self.running += 1
+        try:
+            await asyncio.to_thread(task.func, **job.kwargs)
+        except Exception:
+            if job.attempts <= task.retries:
+                delay = task.retry_delay * 2 ** (job.attempts - 1)
+                self.stats[job.name].retried += 1
+                logger.warning("Job %s failed (attempt %d), retrying in %.1fs", job.name, job.attempts, delay)
+                self.delayed += 1
+                await asyncio.to_thread(_update_job, job, "pending")
+                self._loop.call_later(delay, self._requeue, job)
+            else:
+                self.stats[job.name].failed += 1
+                logger.exception("Job %s failed after %d attempts", job.name, job.attempts)
+                await asyncio.to_thread(_update_job, job, "failed")
+        else:
+            self._record(job, start, time.monotonic())
+            await asyncio.to_thread(_update_job, job, "done")
+        finally:
+            self.running -= 1
+
+    def _requeue(self, job: Job):
+        self.delayed -= 1
+        if self._queue is not None:
+            self._queue.put_nowait(job)
+
+    def _record(self, job: Job, start: float, end: float):
+        stats = self.stats[job.name]
+        wait, run = start - job.enqueued_at, end - start
+        stats.completed += 1
+        stats.total_wait += wait
+        stats.total_run += run
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.max_run = max(stats.max_run, run)
+
+    # Introspection
+
+    def snapshot(self) -> dict:
+        """Queue depth, in-flight jobs and per-task latency (seconds)."""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "delayed": self.delayed,
+            "running": self.running,
+            "workers": self.workers,
+            "tasks": {
+                name: {
+                    "completed": s.completed,
+                    "failed": s.failed,
+                    "retried": s.retried,
+                    "avg_wait": round(s.total_wait / s.completed, 4) if s.completed else 0.0,
+                    "max_wait": round(s.max_wait, 4),
+                    "avg_run": round(s.total_run / s.completed, 4) if s.completed else 0.0,
+                    "max_run": round(s.max_run, 4),
+                }
+                for name, s in sorted(self.stats.items())
+            },
+        }
+
+
+def _seconds_until(hour: int, minute: int) -> float:
+    """Seconds until the next given local time of day."""
+    now = datetime.now()
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+# Durable job table (JOBS_DURABLE=1, durable tasks and periodic runs)
+#
+# Every app process (e.g. each Gunicorn worker) loads pending rows on
+# startup, so a job only runs in the process that claims it: pending ->
+# running in a single UPDATE. Rows left running by a process that died are
+# made pending again after JOB_CLAIM_TIMEOUT, which must exceed the
+# longest job.
+
+JOB_CLAIM_TIMEOUT = float(os.getenv("JOB_CLAIM_TIMEOUT", "3600"))
+
+
+def _store_job(name: str, kwargs: dict) -> int:
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import JobRecord
+
+    with Session(engine) as session:
+        record = JobRecord(name=name, payload=json.dumps(kwargs), status="pending", created_at=datetime.now())
+        session.add(record)
+        session.commit()
+        return record.id
+
+
+def _store_slot(name: str, slot: str) -> int | None:
+    """Record a periodic run, None if another process already did."""
+    from sqlalchemy.exc import IntegrityError
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import JobRecord
+
+    with Session(engine) as session:
+        record = JobRecord(name=name, payload="{}", status="pending", slot=slot, created_at=datetime.now())
+        session.add(record)
+        try:
+            session.commit()
+        except IntegrityError:
+            return None
+        return record.id
+
+
+def _claim_job(job: Job) -> bool:
+    """Mark the job's row running, False if another process got it first."""
+    if job.db_id is None:
+        return True
+    from sqlmodel import Session, update
+    from app.database import engine
+    from app.models import JobRecord
+
+    with Session(engine) as session:
+        result = session.execute(
+            update(JobRecord)
+            .where(JobRecord.id == job.db_id, JobRecord.status == "pending")
+            .values(status="running", claimed_at=datetime.now())
+        )
+        session.commit()
+        return result.rowcount == 1
+
+
+def _update_job(job: Job, status: str):
+    """Record a job's status: done / failed, or pending again before a retry."""
+    if job.db_id is None:
+        return
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import JobRecord
+
+    with Session(engine) as session:
+        record = session.get(JobRecord, job.db_id)
+        if record is not None:
+            record.status = status
+            record.attempts = job.attempts
+            if status != "pending":
+                record.finished_at = datetime.now()
+            session.add(record)
+            session.commit()
+
+
+def _load_pending_jobs(ids) -> list[Job]:
+    """Jobs left pending by a previous process (crash or restart)."""
+    from sqlmodel import Session, select, update
+    from app.database import engine
+    from app.models import JobRecord
+
+    with Session(engine) as session:
+        stale = datetime.now() - timedelta(seconds=JOB_CLAIM_TIMEOUT)
+        session.execute(
+            update(JobRecord)
+            .where(JobRecord.status == "running", JobRecord.claimed_at < stale)
+            .values(status="pending")
+        )
+        session.commit()
+        records = session.exec(select(JobRecord).where(JobRecord.status == "pending")).all()
+        return [
+            Job(id=next(ids), name=r.name, kwargs=json.loads(r.payload), attempts=r.attempts, db_id=r.id)
+            for r in records
+        ]
+
+
+scheduler = JobScheduler(
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    durable=os.getenv("JOBS_DURABLE", "0") == "1",
+)
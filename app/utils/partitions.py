@@ -0,0 +1,405 @@
+# Time-partitioned habitlog storage and archival of cold history
+#
+# Postgres: habitlog is natively range partitioned by month (habitlog_pYYYYMM)
+# MySQL:    habitlog is RANGE COLUMNS(date) partitioned by month (pYYYYMM + pmax)
+# SQLite:   habitlog is the hot table, cold rows move to habitlog_archive
+#
+# Compaction rolls logs older than HABITLOG_HOT_MONTHS into per-habit daily
+# totals (habitlog_daily) and moves the raw rows out of habitlog into
+# habitlog_archive* tables. Reads combine habitlog_daily before the
+# compaction boundary with habitlog after it, and always filter by date so
+# Postgres/MySQL only scan the partitions inside the window.
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import inspect, text, union_all
+from sqlmodel import Session, select, func
+
+from app.models import HabitLog, HabitLogDaily, HabitLogCompaction
+from app.utils.dialects import stream, upsert, bulk_delete
+
+logger = logging.getLogger(__name__)
+
+HOT_MONTHS = int(os.getenv("HABITLOG_HOT_MONTHS", "12"))
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+ARCHIVE_PREFIX = "habitlog_archive"
+COLUMNS = "id, habit_id, user_id, date, value, note"
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+def add_months(d: date, months: int) -> date:
+    years, month = divmod(d.month - 1 + months, 12)
+    return date(d.year + years, month + 1, 1)
+
+def month_range(first: date, last: date) -> list[date]:
+    """First day of every month from first to last inclusive."""
+    months, current = [], month_start(first)
+    while current <= last:
+        months.append(current)
+        current = add_months(current, 1)
+    return months
+
+
+def _data_months(conn) -> list[date]:
+    first, last = conn.execute(text("SELECT MIN(date), MAX(date) FROM habitlog")).one()
+    today = date.today()
+    first = date.fromisoformat(str(first)) if first else today
+    last = max(date.fromisoformat(str(last)) if last else today, today)
+    return month_range(first, add_months(last, MONTHS_AHEAD))
+
+
+# Postgres
+
+def _pg_partitions(conn) -> dict[date, str]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'habitlog'"
+    )).scalars()
+    return {date(int(name[-6:-2]), int(name[-2:]), 1): name for name in rows}
+
+def _pg_create_partition(conn, month: date):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS habitlog_p{month:%Y%m} PARTITION OF habitlog "
+        f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    ))
+
+def _pg_partition(conn):
+    months = _data_months(conn)
+    # Index names are schema-wide, it is recreated on the new table
+    conn.execute(text("DROP INDEX IF EXISTS ix_habitlog_habit_user_date"))
+    conn.execute(text("ALTER TABLE habitlog RENAME TO habitlog_unpartitioned"))
+    conn.execute(text("ALTER TABLE habitlog_unpartitioned RENAME CONSTRAINT habitlog_pkey TO habitlog_unpartitioned_pkey"))
+    conn.execute(text("ALTER SEQUENCE habitlog_id_seq OWNED BY NONE"))
+    # The partition key must be part of the primary key
+    conn.execute(text(
+        "CREATE TABLE habitlog ("
+        " id INTEGER NOT NULL DEFAULT nextval('habitlog_id_seq'),"
+        " habit_id INTEGER NOT NULL REFERENCES habit (id),"
+        " user_id INTEGER NOT NULL REFERENCES users (id),"
+        " date DATE NOT NULL,"
+        " value INTEGER NOT NULL,"
+        " note VARCHAR,"
+        " CONSTRAINT habitlog_pkey PRIMARY KEY (id, date)"
+        ") PARTITION BY RANGE (date)"
+    ))
+    for month in months:
+        _pg_create_partition(conn, month)
+    conn.execute(text(f"INSERT INTO habitlog ({COLUMNS}) SELECT {COLUMNS} FROM habitlog_unpartitioned"))
+    conn.execute(text("DROP TABLE habitlog_unpartitioned"))
+    conn.execute(text("ALTER SEQUENCE habitlog_id_seq OWNED BY habitlog.id"))
+    conn.execute(text("CREATE INDEX ix_habitlog_habit_user_date ON habitlog (habit_id, user_id, date)"))
+
+def _pg_unpartition(conn):
+    conn.execute(text("DROP INDEX IF EXISTS ix_habitlog_habit_user_date"))
+    conn.execute(text("ALTER TABLE habitlog RENAME TO habitlog_partitioned"))
+    conn.execute(text("ALTER TABLE habitlog_partitioned RENAME CONSTRAINT habitlog_pkey TO habitlog_partitioned_pkey"))
+    conn.execute(text("ALTER SEQUENCE habitlog_id_seq OWNED BY NONE"))
+    conn.execute(text(
+        "CREATE TABLE habitlog ("
+        " id INTEGER NOT NULL DEFAULT nextval('habitlog_id_seq'),"
+        " habit_id INTEGER NOT NULL REFERENCES habit (id),"
+        " user_id INTEGER NOT NULL REFERENCES users (id),"
+        " date DATE NOT NULL,"
+        " value INTEGER NOT NULL,"
+        " note VARCHAR,"
+        " CONSTRAINT habitlog_pkey PRIMARY KEY (id)"
+        ")"
+    ))
+    for source in ["habitlog_partitioned", *archive_tables(conn)]:
+        conn.execute(text(f"INSERT INTO habitlog ({COLUMNS}) SELECT {COLUMNS} FROM {source}"))
+        conn.execute(text(f"DROP TABLE {source}"))
+    conn.execute(text("ALTER SEQUENCE habitlog_id_seq OWNED BY habitlog.id"))
+    conn.execute(text("CREATE INDEX ix_habitlog_habit_user_date ON habitlog (habit_id, user_id, date)"))
+
+
+# MySQL
+
+def _mysql_partitions(conn) -> dict[date, str]:
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'habitlog' "
+        "AND PARTITION_NAME IS NOT NULL AND PARTITION_NAME != 'pmax'"
+    )).scalars()
+    return {date(int(name[1:5]), int(name[5:7]), 1): name for name in rows}
+
+def _mysql_partition_sql(months: list[date]) -> str:
+    parts = [
+        f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{add_months(month, 1)}')"
+        for month in months
+    ]
+    parts.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return ", ".join(parts)
+
+def _mysql_partition(conn):
+    months = _data_months(conn)
+    # InnoDB partitioned tables cannot have foreign keys, and the
+    # partition key must be part of the primary key
+    for fk in inspect(conn).get_foreign_keys("habitlog"):
+        conn.execute(text(f"ALTER TABLE habitlog DROP FOREIGN KEY {fk['name']}"))
+    conn.execute(text("ALTER TABLE habitlog DROP PRIMARY KEY, ADD PRIMARY KEY (id, date)"))
+    conn.execute(text(f"ALTER TABLE habitlog PARTITION BY RANGE COLUMNS(date) ({_mysql_partition_sql(months)})"))
+
+def _mysql_unpartition(conn):
+    conn.execute(text("ALTER TABLE habitlog REMOVE PARTITIONING"))
+    for table in archive_tables(conn):
+        conn.execute(text(f"INSERT INTO habitlog ({COLUMNS}) SELECT {COLUMNS} FROM {table}"))
+        conn.execute(text(f"DROP TABLE {table}"))
+    conn.execute(text("ALTER TABLE habitlog DROP PRIMARY KEY, ADD PRIMARY KEY (id)"))
+    conn.execute(text("ALTER TABLE habitlog ADD FOREIGN KEY (habit_id) REFERENCES habit (id)"))
+    conn.execute(text("ALTER TABLE habitlog ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+
+
+# SQLite
+
+def _sqlite_partition(conn):
+    conn.execute(text(
+        f"CREATE TABLE {ARCHIVE_PREFIX} ("
+        " id INTEGER NOT NULL PRIMARY KEY,"
+        " habit_id INTEGER NOT NULL,"
+        " user_id INTEGER NOT NULL,"
+        " date DATE NOT NULL,"
+        " value INTEGER NOT NULL,"
+        " note VARCHAR"
+        ")"
+    ))
+    conn.execute(text(f"CREATE INDEX ix_{ARCHIVE_PREFIX}_habit_user_date ON {ARCHIVE_PREFIX} (habit_id, user_id, date)"))
+
+def _sqlite_unpartition(conn):
+    conn.execute(text(f"INSERT INTO habitlog ({COLUMNS}) SELECT {COLUMNS} FROM {ARCHIVE_PREFIX}"))
+    conn.execute(text(f"DROP TABLE {ARCHIVE_PREFIX}"))
+
+
+# Setup (used by the Alembic migration and the benchmarks)
+
+def partition_habitlog(conn):
+    """Convert habitlog to this dialect's partitioned layout."""
+    {
+        "postgresql": _pg_partition,
+        "mysql": _mysql_partition,
+        "sqlite": _sqlite_partition,
+    }[conn.dialect.name](conn)
+
+def unpartition_habitlog(conn):
+    """Undo partition_habitlog, moving archived rows back into habitlog."""
+    {
+        "postgresql": _pg_unpartition,
+        "mysql": _mysql_unpartition,
+        "sqlite": _sqlite_unpartition,
+    }[conn.dialect.name](conn)
+
+
+def archive_tables(conn) -> list[str]:
+    return sorted(t for t in inspect(conn).get_table_names() if t.startswith(ARCHIVE_PREFIX))
+
+
+def ensure_partitions(engine, months_ahead: int = MONTHS_AHEAD):
+    """Create monthly partitions from the current month to months_ahead."""
+    today = date.today()
+    wanted = month_range(today, add_months(today, months_ahead))
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            for month in wanted:
+                _pg_create_partition(conn, month)
+
+        elif conn.dialect.name == "mysql":
+            existing = _mysql_partitions(conn)
+            last = max(existing, default=None)
+            missing = [m for m in wanted if last is None or m > last]
+            if missing:
+                # Split the catch-all partition, rows already in it move along
+                conn.execute(text(
+                    f"ALTER TABLE habitlog REORGANIZE PARTITION pmax INTO ({_mysql_partition_sql(missing)})"
+                ))
+
+
+# Compaction
+
+def get_boundary(session) -> date | None:
+    """Logs before this date are compacted (None if nothing is)."""
+    state = session.get(HabitLogCompaction, 1)
+    return state.compacted_before if state else None
+
+
+def compact_history(engine, before: date | None = None) -> int:
+    """
+    Roll up logs before `before` (default: start of the month HOT_MONTHS ago)
+    into habitlog_daily, then move the raw rows out of habitlog.
+    Returns the number of daily rows written.
+    """
+    before = month_start(before or add_months(date.today(), -HOT_MONTHS))
+
+    # 1. Aggregate and move the boundary in one transaction, readers switch
+    #    to habitlog_daily for the compacted range atomically
+    with Session(engine) as session:
+        previous = get_boundary(session)
+        if previous is not None and previous >= before:
+            # Already compacted, but the move below may have been interrupted
+            _archive_cold(engine, previous)
+            return 0
+
+        window = [HabitLog.date < before]
+        if previous is not None:
+            window.append(HabitLog.date >= previous)
+
+        stmt = (
+            select(
+                HabitLog.habit_id, HabitLog.user_id, HabitLog.date,
+                func.sum(HabitLog.value), func.count(HabitLog.id)
+            )
+            .where(*window)
+            .group_by(HabitLog.habit_id, HabitLog.user_id, HabitLog.date)
+        )
+
+        # Streamed in chunks on its own connection (a MySQL server-side
+        # cursor blocks its connection); upsert so re-running after an
+        # interrupted compaction simply overwrites what was already written
+        written = 0
+        with engine.connect() as reader:
+            for chunk in stream(reader, stmt):
+                upsert(session, HabitLogDaily, [
+                    {"habit_id": h, "user_id": u, "date": d, "total_minutes": total, "log_count": count}
+                    for h, u, d, total, count in chunk
+                ], keys=["habit_id", "user_id", "date"])
+                written += len(chunk)
+
+        session.merge(HabitLogCompaction(id=1, compacted_before=before))
+        session.commit()
+
+    # 2. Move the raw rows (DDL on Postgres/MySQL, so outside the transaction above)
+    _archive_cold(engine, before)
+
+    logger.info("Compacted habitlog before %s (%d daily rows)", before, written)
+    return written
+
+
+def _archive_cold(engine, before: date):
+    """
+    Move raw rows before the boundary out of habitlog. Idempotent, so a
+    run interrupted halfway is finished by the next one.
+    """
+    with engine.begin() as conn:
+        dialect = conn.dialect.name
+        if dialect == "sqlite":
+            conn.execute(text(
+                f"INSERT INTO {ARCHIVE_PREFIX} ({COLUMNS}) SELECT {COLUMNS} FROM habitlog WHERE date < :before"
+            ), {"before": before})
+            conn.execute(text("DELETE FROM habitlog WHERE date < :before"), {"before": before})
+
+        elif dialect == "postgresql":
+            # Transactional DDL: a partition is either still attached or archived
+            for month, name in sorted(_pg_partitions(conn).items()):
+                if add_months(month, 1) <= before:
+                    conn.execute(text(f"ALTER TABLE habitlog DETACH PARTITION {name}"))
+                    conn.execute(text(f"ALTER TABLE {name} RENAME TO {ARCHIVE_PREFIX}_p{month:%Y%m}"))
+
+        elif dialect == "mysql":
+            # Every DDL statement commits on its own, so pick up from
+            # whichever step an earlier run stopped at
+            archives = set(archive_tables(conn))
+            for month, name in sorted(_mysql_partitions(conn).items()):
+                if add_months(month, 1) > before:
+                    continue
+                archive = f"{ARCHIVE_PREFIX}_p{month:%Y%m}"
+                if archive not in archives:
+                    conn.execute(text(f"CREATE TABLE {archive} LIKE habitlog"))
+                if _mysql_is_partitioned(conn, archive):
+                    conn.execute(text(f"ALTER TABLE {archive} REMOVE PARTITIONING"))
+                # A non-empty archive means the exchange already happened
+                if conn.execute(text(f"SELECT 1 FROM {archive} LIMIT 1")).first() is None:
+                    conn.execute(text(f"ALTER TABLE habitlog EXCHANGE PARTITION {name} WITH TABLE {archive}"))
+                conn.execute(text(f"ALTER TABLE habitlog DROP PARTITION {name}"))
+
+
+def _mysql_is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"
+    ), {"table": table}).first() is not None
+
+
+def delete_history(session, habit_id: int | None = None, user_id: int | None = None):
+    """Delete compacted totals and archived logs of a habit and/or user."""
+    criteria, where, params = [], [], {}
+    if habit_id is not None:
+        criteria.append(HabitLogDaily.habit_id == habit_id)
+        where.append("habit_id = :habit_id")
+        params["habit_id"] = habit_id
+    if user_id is not None:
+        criteria.append(HabitLogDaily.user_id == user_id)
+        where.append("user_id = :user_id")
+        params["user_id"] = user_id
+    if not where:
+        raise ValueError("habit_id or user_id is required")
+
+    bulk_delete(session, HabitLogDaily, *criteria)
+    for table in archive_tables(session.connection()):
+        session.execute(text(f"DELETE FROM {table} WHERE {' AND '.join(where)}"), params)
+
+
+# Reads
+
+def daily_totals(session, habit_ids: list[int], user_id: int,
+                 start: date | None = None, end: date | None = None) -> list:
+    """
+    Per-habit daily totals between start and end (inclusive, open if None),
+    as rows of (habit_id, date, total_minutes) sorted by habit and date.
+    One query: hot logs grouped by day, plus compacted totals if the window
+    reaches past the compaction boundary.
+    """
+    boundary = get_boundary(session)
+
+    hot = (
+        select(
+            HabitLog.habit_id,
+            HabitLog.date,
+            func.sum(HabitLog.value).label("total_minutes")
+        )
+        .where(HabitLog.habit_id.in_(habit_ids), HabitLog.user_id == user_id)
+        .group_by(HabitLog.habit_id, HabitLog.date)
+    )
+    hot_start = max((d for d in (start, boundary) if d is not None), default=None)
+    if hot_start is not None:
+        hot = hot.where(HabitLog.date >= hot_start)
+    if end is not None:
+        hot = hot.where(HabitLog.date <= end)
+
+    stmt = hot
+    if boundary is not None and (start is None or start < boundary):
+        cold = select(
+            HabitLogDaily.habit_id,
+            HabitLogDaily.date,
+            HabitLogDaily.total_minutes
+        ).where(
+            HabitLogDaily.habit_id.in_(habit_ids),
+            HabitLogDaily.user_id == user_id,
+            HabitLogDaily.date < boundary
+        )
+        if start is not None:
+            cold = cold.where(HabitLogDaily.date >= start)
+        if end is not None:
+            cold = cold.where(HabitLogDaily.date <= end)
+        stmt = union_all(hot, cold)
+
+    rows = session.execute(stmt).all()
+    return sorted(rows, key=lambda r: (r.habit_id, r.date))
+
+
+def first_log_date(session, habit_id: int, user_id: int) -> date | None:
+    """Earliest day with data for a habit, compacted history included."""
+    first = session.exec(
+        select(func.min(HabitLogDaily.date))
+        .where(HabitLogDaily.habit_id == habit_id, HabitLogDaily.user_id == user_id)
+    ).first()
+    if first is not None:
+        return first
+    return session.exec(
+        select(func.min(HabitLog.date))
+        .where(HabitLog.habit_id == habit_id, HabitLog.user_id == user_id)
+    ).first()
@@ -0,0 +1,298 @@
+# Opt-in memory and CPU profiling of request handlers
+#
+# A request is profiled when it sends `X-Profile: <DEBUG_TOKEN>` or is picked
+# by the sampling rate, which can be changed at runtime via /debug/profiling.
+# tracemalloc records the peak memory of the request and the allocations
+# (blocks and the frames that made them) still alive once the response is
+# built; template responses keep their context, so a handler's rows count.
+# With cProfile on, the endpoint also runs under cProfile in its own thread.
+#
+# tracemalloc is process wide: one request is profiled at a time and its
+# numbers include whatever concurrent requests allocated meanwhile.
+# Dumps under PROFILE_DIR: .prof (pstats, loads in snakeviz/gprof2dot) and
+# .tracemalloc (tracemalloc.Snapshot.load).
+import cProfile
+import contextvars
+import functools
+import inspect
+import itertools
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.security import check_debug_token
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+
+# cProfile of the request being profiled, enabled around the endpoint
+_cprofile: contextvars.ContextVar[cProfile.Profile | None] = contextvars.ContextVar("cprofile", default=None)
+
+# Allocations made by the profiler itself
+_IGNORED = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+
+
+@dataclass
+class ProfileSettings:
+    sample_rate: float = 0.0    # share of requests profiled without the header
+    cprofile: bool = False
+    dump: bool = False          # write .prof / .tracemalloc files
+    frames: int = 10            # traceback depth recorded by tracemalloc
+    top: int = 10               # frames / functions kept per record
+
+
+@dataclass
+class ProfileRecord:
+    id: int
+    method: str
+    route: str
+    path: str
+    status: int
+    started_at: float
+    duration_ms: float
+    peak_bytes: int         # high-water mark during the request
+    allocated_bytes: int    # still allocated when the response was built
+    allocations: int        # memory blocks behind allocated_bytes
+    top_frames: list[dict] = field(default_factory=list)
+    top_functions: list[dict] = field(default_factory=list)
+    files: dict[str, str] = field(default_factory=dict)
+
+
+def _short(filename: str) -> str:
+    """Path relative to the project or site-packages, for readability."""
+    if "site-packages" in filename:
+        return filename.split("site-packages", 1)[1].lstrip("/\\")
+    return os.path.relpath(filename) if filename.startswith(os.getcwd()) else filename
+
+
+def _top_frames(snapshot, before, top: int) -> tuple[list[dict], int]:
+    """Largest allocation sites (full tracebacks, most recent frame first) and total blocks."""
+    if before is None:
+        stats = [(s.traceback, s.size, s.count) for s in snapshot.statistics("traceback")]
+    else:
+        stats = [(s.traceback, s.size_diff, s.count_diff)
+                 for s in snapshot.compare_to(before, "traceback") if s.size_diff > 0]
+        stats.sort(key=lambda s: s[1], reverse=True)
+
+    frames = [
+        {"size": size, "count": count,
+         "traceback": [f"{_short(f.filename)}:{f.lineno}" for f in reversed(tb)]}
+        for tb, size, count in stats[:top]
+    ]
+    return frames, sum(count for _, _, count in stats)
+
+
+def _top_functions(profile: cProfile.Profile, top: int) -> list[dict]:
+    """Functions with the highest cumulative time."""
+    stats = pstats.Stats(profile)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    rows = []
+    for func in stats.fcn_list[:top]:
+        _, calls, total, cumulative, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            "function": f"{_short(filename)}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        })
+    return rows
+
+
+class RequestProfiler:
+    """
+    HTTP middleware profiling opted-in requests with tracemalloc (and
+    cProfile through ProfiledRoute). Keeps the last `keep` records.
+    """
+
+    def __init__(self, settings: ProfileSettings, directory: str, keep: int = 100):
+        self.settings = settings
+        self.directory = Path(directory)
+        self.keep = keep
+        self.records: deque[ProfileRecord] = deque()
+        self._ids = itertools.count(1)
+        # tracemalloc is global, so only one request is profiled at a time
+        self._lock = threading.Lock()
+
+    def wants(self, request) -> bool:
+        if check_debug_token(request.headers.get(PROFILE_HEADER)):
+            return True
+        rate = self.settings.sample_rate
+        return rate > 0 and random.random() < rate
+
+    async def __call__(self, request, call_next):
+        # Requests arriving while another one is profiled run unprofiled
+        if not self.wants(request) or not self._lock.acquire(blocking=False):
+            return await call_next(request)
+        try:
+            return await self._profile(request, call_next)
+        finally:
+            self._lock.release()
+
+    async def _profile(self, request, call_next):
+        settings = self.settings
+        # Respect tracing started elsewhere (PYTHONTRACEMALLOC), diffing against it
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(settings.frames)
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(_IGNORED) if was_tracing else None
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+
+            profile = cProfile.Profile() if settings.cprofile else None
+            token = _cprofile.set(profile)
+            started, start = time.time(), time.perf_counter()
+            try:
+                response = await call_next(request)
+            finally:
+                _cprofile.reset(token)
+            duration = time.perf_counter() - start
+
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+        route = request.scope.get("route")
+        record = ProfileRecord(
+            id=next(self._ids),
+            method=request.method,
+            route=getattr(route, "path", request.url.path),
+            path=request.url.path,
+            status=response.status_code,
+            started_at=started,
+            duration_ms=round(duration * 1000, 3),
+            peak_bytes=peak - base,
+            allocated_bytes=current - base,
+            allocations=0,
+        )
+        # Statistics and dumps are slow, keep them off the event loop
+        await run_in_threadpool(self._finish, record, snapshot, before, profile)
+
+        response.headers["X-Profile-Id"] = str(record.id)
+        return response
+
+    def _finish(self, record, snapshot, before, profile):
+        settings = self.settings
+        record.top_frames, record.allocations = _top_frames(snapshot, before, settings.top)
+        if profile is not None and profile.getstats():
+            record.top_functions = _top_functions(profile, settings.top)
+
+        if settings.dump:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            stem = self.directory / f"{record.id:06d}"
+            snapshot.dump(f"{stem}.tracemalloc")
+            record.files["tracemalloc"] = f"{stem}.tracemalloc"
+            if record.top_functions:
+                profile.dump_stats(f"{stem}.prof")
+                record.files["prof"] = f"{stem}.prof"
+
+        self._add(record)
+        logger.info("Profiled %s %s: %.1f ms, peak %d B, %d blocks",
+                    record.method, record.route, record.duration_ms, record.peak_bytes, record.allocations)
+
+    def _add(self, record: ProfileRecord):
+        self.records.append(record)
+        while len(self.records) > self.keep:
+            old = self.records.popleft()
+            for path in old.files.values():
+                Path(path).unlink(missing_ok=True)
+
+    def get(self, record_id: int) -> ProfileRecord | None:
+        return next((r for r in list(self.records) if r.id == record_id), None)
+
+    def clear(self):
+        while self.records:
+            for path in self.records.popleft().files.values():
+                Path(path).unlink(missing_ok=True)
+
+    def summary(self) -> dict:
+        """Per-route averages and maxima over the kept records."""
+        by_route = defaultdict(list)
+        for r in list(self.records):
+            by_route[f"{r.method} {r.route}"].append(r)
+        return {
+            route: {
+                "count": len(rs),
+                "avg_ms": round(sum(r.duration_ms for r in rs) / len(rs), 3),
+                "avg_peak_bytes": sum(r.peak_bytes for r in rs) // len(rs),
+                "max_peak_bytes": max(r.peak_bytes for r in rs),
+                "avg_allocations": sum(r.allocations for r in rs) // len(rs),
+            }
+            for route, rs in sorted(by_route.items())
+        }
+
+
+def profiled(endpoint):
+    """Run endpoint under the request's cProfile, if any, in the thread it runs in."""
+    # include_router rebuilds routes with the same route class
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profile = _cprofile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            profile.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile.disable()
+        wrapper.__profiled__ = True
+        return wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _cprofile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        # cProfile only sees the thread it is enabled in (sync
+        # endpoints run in the threadpool, not in the middleware)
+        profile.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.disable()
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute whose endpoint can be profiled with cProfile, see `profiled`.
+    Routers opt in with `APIRouter(route_class=ProfiledRoute)`; without it
+    requests still get tracemalloc numbers, but no function timings.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+profiler = RequestProfiler(
+    ProfileSettings(
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        cprofile=os.getenv("PROFILE_CPROFILE", "0") == "1",
+        dump=os.getenv("PROFILE_DUMP", "0") == "1",
+        frames=int(os.getenv("PROFILE_FRAMES", "10")),
+    ),
+    directory=os.getenv("PROFILE_DIR", "profiles"),
+    keep=int(os.getenv("PROFILE_KEEP", "100")),
+)
@@ -0,0 +1,107 @@
+# Token-bucket rate limiting and concurrency limits for expensive routes
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage for token buckets. The in-memory backend is per process;
+    implement this on a shared store (e.g. Redis) to limit across workers.
+    """
+
+    @abstractmethod
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        """
+        Try to take `cost` tokens from the bucket for `key`, refilled at
+        `rate` tokens per second up to `burst`.
+        Returns 0 if allowed, otherwise the seconds until enough tokens exist.
+        """
+
+
+class InMemoryBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time); oldest touched first
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            # Idle buckets are the least recently used, dropping them only
+            # ever gives a client a fresh (full) bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+            return wait
+
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on in-flight requests; callers shed instead of queueing."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+_backend: RateLimitBackend = InMemoryBackend()
+
+# (scope, reason) -> count, reason is "rate_limited" or "shed"
+rejections: Counter = Counter()
+_limiters: dict[str, ConcurrencyLimiter] = {}
+
+
+def get_backend() -> RateLimitBackend:
+    return _backend
+
+def set_backend(backend: RateLimitBackend):
+    global _backend
+    _backend = backend
+
+
+def get_limiter(scope: str, limit: int) -> ConcurrencyLimiter:
+    limiter = _limiters.get(scope)
+    if limiter is None:
+        limiter = _limiters[scope] = ConcurrencyLimiter(limit)
+    return limiter
+
+
+def record_rejection(scope: str, reason: str):
+    rejections[(scope, reason)] += 1
+
+
+def metrics() -> dict:
+    """Rejection counts and current in-flight requests per scope."""
+    scopes = {scope for scope, _ in rejections} | set(_limiters)
+    return {
+        scope: {
+            "rate_limited": rejections[(scope, "rate_limited")],
+            "shed": rejections[(scope, "shed")],
+            "in_flight": _limiters[scope].in_flight if scope in _limiters else 0,
+        }
+        for scope in sorted(scopes)
+    }
@@ -0,0 +1,264 @@
+# Full-text search over habit names and log notes
+#
+# Searchable text is copied into search_entry, a plain table outside the
+# partitioned habitlog: entries survive compaction/archival of old logs and
+# MySQL can index it (FULLTEXT is not supported on partitioned tables).
+#
+# SQLite:   FTS5 external content table search_entry_fts, kept in sync by
+#           triggers; an `owner` token column scopes matches to one user
+# Postgres: generated tsvector column body_tsv with a GIN index
+# MySQL:    InnoDB FULLTEXT index on body
+#
+# No stemming on any backend (MySQL has none): the last query word is matched
+# as a prefix, which stemmed indexes cannot do ("runn*" never matches "run").
+# Routes keep search_entry in sync in the same transaction as their writes.
+import re
+from dataclasses import dataclass
+from datetime import date
+
+from markupsafe import Markup, escape
+from sqlalchemy import Date, text
+from sqlmodel import delete
+
+from app.models import SearchEntry
+from app.utils.dialects import bulk_delete
+from app.utils.partitions import archive_tables
+
+FTS_TABLE = "search_entry_fts"
+# Objects created here rather than by the models (skipped by Alembic autogenerate)
+FTS_OBJECTS = {"body_tsv", "ix_search_entry_body_tsv", "ix_search_entry_body"}
+
+TS_CONFIG = "simple"  # Postgres text search configuration
+PER_PAGE = 20
+MAX_TERMS = 8
+SNIPPET_WORDS = 12
+
+# Highlight markers, swapped for <mark> after the snippet is HTML escaped
+START, STOP = "\x02", "\x03"
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    habit_id: int
+    habit_name: str
+    date: date | None
+    snippet: Markup
+    score: float  # higher is better on Postgres/MySQL, lower (bm25) on SQLite
+
+
+# Setup (used by the Alembic migration and the benchmarks)
+
+def create_search_index(conn):
+    """Create this dialect's full-text index on search_entry."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        # Matching `owner:u<user_id>` intersects posting lists inside FTS5,
+        # so other users' matches are never ranked or joined
+        conn.execute(text(
+            "CREATE VIEW search_entry_doc AS"
+            " SELECT id, body, 'u' || user_id AS owner FROM search_entry"
+        ))
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            " body, owner, content='search_entry_doc', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ))
+        insert = f"INSERT INTO {FTS_TABLE} (rowid, body, owner) VALUES (new.id, new.body, 'u' || new.user_id);"
+        remove = (f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, body, owner)"
+                  " VALUES ('delete', old.id, old.body, 'u' || old.user_id);")
+        conn.execute(text(f"CREATE TRIGGER search_entry_ai AFTER INSERT ON search_entry BEGIN {insert} END"))
+        conn.execute(text(f"CREATE TRIGGER search_entry_ad AFTER DELETE ON search_entry BEGIN {remove} END"))
+        conn.execute(text(f"CREATE TRIGGER search_entry_au AFTER UPDATE ON search_entry BEGIN {remove} {insert} END"))
+        # Index rows that already exist
+        conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+
+    elif dialect == "postgresql":
+        conn.execute(text(
+            "ALTER TABLE search_entry ADD COLUMN body_tsv tsvector"
+            f" GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', body)) STORED"
+        ))
+        conn.execute(text("CREATE INDEX ix_search_entry_body_tsv ON search_entry USING GIN (body_tsv)"))
+
+    elif dialect == "mysql":
+        conn.execute(text("CREATE FULLTEXT INDEX ix_search_entry_body ON search_entry (body)"))
+
+
+def drop_search_index(conn):
+    """Undo create_search_index."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        for trigger in ("search_entry_ai", "search_entry_ad", "search_entry_au"):
+            conn.execute(text(f"DROP TRIGGER {trigger}"))
+        conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+        conn.execute(text("DROP VIEW search_entry_doc"))
+    elif dialect == "postgresql":
+        conn.execute(text("DROP INDEX ix_search_entry_body_tsv"))
+        conn.execute(text("ALTER TABLE search_entry DROP COLUMN body_tsv"))
+    elif dialect == "mysql":
+        conn.execute(text("DROP INDEX ix_search_entry_body ON search_entry"))
+
+
+def rebuild_index(conn):
+    """Refill search_entry from habits, logs and archived logs."""
+    conn.execute(delete(SearchEntry))
+    conn.execute(text(
+        "INSERT INTO search_entry (kind, ref_id, habit_id, user_id, date, body)"
+        " SELECT 'habit', id, id, user_id, NULL, name FROM habit"
+    ))
+    for table in ["habitlog", *archive_tables(conn)]:
+        conn.execute(text(
+            "INSERT INTO search_entry (kind, ref_id, habit_id, user_id, date, body)"
+            f" SELECT 'log', id, habit_id, user_id, date, note FROM {table}"
+            " WHERE note IS NOT NULL AND note <> ''"
+        ))
+
+
+# Sync (called from the write/delete paths before their commit)
+
+def index_habit(session, habit):
+    session.add(SearchEntry(kind="habit", ref_id=habit.id, habit_id=habit.id,
+                            user_id=habit.user_id, body=habit.name))
+
+def index_log(session, log):
+    if log.note and log.note.strip():
+        session.add(SearchEntry(kind="log", ref_id=log.id, habit_id=log.habit_id,
+                                user_id=log.user_id, date=log.date, body=log.note))
+
+def unindex_log(session, log_id: int):
+    bulk_delete(session, SearchEntry, SearchEntry.kind == "log", SearchEntry.ref_id == log_id)
+
+def unindex(session, habit_id: int | None = None, user_id: int | None = None):
+    """Remove entries of a habit and/or user."""
+    criteria = []
+    if habit_id is not None:
+        criteria.append(SearchEntry.habit_id == habit_id)
+    if user_id is not None:
+        criteria.append(SearchEntry.user_id == user_id)
+    if not criteria:
+        raise ValueError("habit_id or user_id is required")
+    bulk_delete(session, SearchEntry, *criteria)
+
+
+# Queries
+
+def parse_terms(q: str) -> list[str]:
+    """Words of the query. Matched as AND, the last one as a prefix."""
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def _sqlite_query(terms, user_id):
+    match = f"owner:u{user_id} AND body:(" + " ".join(f'"{t}"' for t in terms) + "*)"
+    # bm25 weights: body 1, owner 0
+    sql = f"""
+        SELECT e.kind, e.habit_id, h.name AS habit_name, e.date,
+               snippet({FTS_TABLE}, 0, :start, :stop, '…', :words) AS snippet,
+               bm25({FTS_TABLE}, 1.0, 0.0) AS score
+        FROM {FTS_TABLE}
+        JOIN search_entry AS e ON e.id = {FTS_TABLE}.rowid
+        JOIN habit AS h ON h.id = e.habit_id
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY score, e.id DESC
+        LIMIT :limit OFFSET :offset
+    """
+    return sql, {"match": match, "start": START, "stop": STOP, "words": SNIPPET_WORDS}
+
+
+def _pg_query(terms, user_id):
+    tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    # Headlines are expensive, only build them for the page being returned
+    sql = f"""
+        SELECT e.kind, e.habit_id, h.name AS habit_name, e.date,
+               ts_headline('{TS_CONFIG}', e.body, to_tsquery('{TS_CONFIG}', :tsquery), :options) AS snippet,
+               hits.score
+        FROM (SELECT id, ts_rank_cd(body_tsv, to_tsquery('{TS_CONFIG}', :tsquery)) AS score
+              FROM search_entry
+              WHERE body_tsv @@ to_tsquery('{TS_CONFIG}', :tsquery) AND user_id = :user_id
+              ORDER BY score DESC, id DESC
+              LIMIT :limit OFFSET :offset) AS hits
+        JOIN search_entry AS e ON e.id = hits.id
+        JOIN habit AS h ON h.id = e.habit_id
+        ORDER BY hits.score DESC, e.id DESC
+    """
+    options = f"StartSel={START}, StopSel={STOP}, MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}"
+    return sql, {"tsquery": tsquery, "options": options}
+
+
+def _mysql_query(terms, user_id):
+    match = " ".join(f"+{t}" for t in terms) + "*"
+    sql = """
+        SELECT e.kind, e.habit_id, h.name AS habit_name, e.date, e.body AS snippet,
+               MATCH (e.body) AGAINST (:match IN BOOLEAN MODE) AS score
+        FROM search_entry AS e
+        JOIN habit AS h ON h.id = e.habit_id
+        WHERE MATCH (e.body) AGAINST (:match IN BOOLEAN MODE) AND e.user_id = :user_id
+        ORDER BY score DESC, e.id DESC
+        LIMIT :limit OFFSET :offset
+    """
+    return sql, {"match": match}
+
+
+def highlight(body: str, terms: list[str], words: int = SNIPPET_WORDS) -> str:
+    """
+    Snippet of body around the first matching word with matches wrapped
+    in START/STOP (for MySQL, which has no snippet function).
+    """
+    def matches(word):
+        word = word.lower()
+        return word in terms[:-1] or word.startswith(terms[-1])
+
+    tokens = body.split()
+    first = next((i for i, t in enumerate(tokens) if any(matches(w) for w in re.findall(r"\w+", t))), 0)
+    lo = max(first - words // 2, 0)
+    window = tokens[lo:lo + words]
+
+    snippet = re.sub(r"\w+", lambda m: f"{START}{m[0]}{STOP}" if matches(m[0]) else m[0], " ".join(window))
+    if lo > 0:
+        snippet = "…" + snippet
+    if lo + words < len(tokens):
+        snippet += "…"
+    return snippet
+
+
+def to_markup(snippet: str) -> Markup:
+    """HTML escape a snippet, turning the highlight markers into <mark>."""
+    html = str(escape(snippet)).replace(START, "<mark>").replace(STOP, "</mark>")
+    return Markup(html)
+
+
+def search(session, user_id: int, q: str, page: int = 1,
+           per_page: int = PER_PAGE) -> tuple[list[SearchHit], bool]:
+    """
+    Ranked matches of q in the user's habit names and log notes.
+    Returns one page of hits and whether there is a next page.
+    """
+    terms = parse_terms(q)
+    if not terms:
+        return [], False
+
+    dialect = session.get_bind().dialect.name
+    sql, params = {
+        "sqlite": _sqlite_query,
+        "postgresql": _pg_query,
+        "mysql": _mysql_query,
+    }[dialect](terms, user_id)
+
+    # One extra row tells whether there is a next page, without a COUNT
+    rows = session.execute(text(sql).columns(date=Date), {
+        **params,
+        "user_id": user_id,
+        "limit": per_page + 1,
+        "offset": (page - 1) * per_page,
+    }).all()
+
+    hits = []
+    for row in rows[:per_page]:
+        snippet = highlight(row.snippet, terms) if dialect == "mysql" else row.snippet
+        hits.append(SearchHit(
+            kind=row.kind,
+            habit_id=row.habit_id,
+            habit_name=row.habit_name,
+            date=row.date,
+            snippet=to_markup(snippet),
+            score=row.score,
+        ))
+    return hits, len(rows) > per_page
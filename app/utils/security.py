@@ -1,3 +1,6 @@
+import hmac
+import os
+
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(
@@ -11,6 +14,13 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def check_debug_token(token: str | None) -> bool:
+    """True if token matches DEBUG_TOKEN (always False when it is unset)."""
+    expected = os.getenv("DEBUG_TOKEN")
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(token.encode(), expected.encode())
+
 
 # Example usage
 if __name__ == "__main__":
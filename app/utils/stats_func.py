@@ -19,32 +19,19 @@ def prepare_daily_aggregation_list(
     habit_id: int,
     user_id: int,
     required_days: int, 
-    end_date: date = date.today()
+    end_date: date | None = None
 ):
     """Prepare a list of DailyAggregation for the past required_days."""
     from app.schemas import DailyAggregation
     from datetime import timedelta
-    from sqlmodel import select, func
-    from app.models import HabitLog
+    from app.utils.partitions import daily_totals
     
+    end_date = end_date or date.today()
     start_date = end_date - timedelta(days=required_days - 1)
     
-    stmt = (
-        select(
-            HabitLog.date,
-            func.sum(HabitLog.value).label("total_minutes")
-        )
-        .where(
-            (HabitLog.habit_id == habit_id) &
-            (HabitLog.user_id == user_id) &
-            (HabitLog.date >= start_date) &
-            (HabitLog.date <= end_date)
-        )
-        .group_by(HabitLog.date)
-    )
-    result = session.exec(stmt).all()
+    # Only touches the partitions (or compacted totals) inside the window
+    result = daily_totals(session, [habit_id], user_id, start_date, end_date)
     
-    start_date = date.today() - timedelta(days=required_days - 1)
     daily_aggregations = []
     date_set = {record.date: record.total_minutes for record in result}
     
@@ -55,4 +42,48 @@ def prepare_daily_aggregation_list(
             DailyAggregation(date=current_date, total_minutes=total_minutes)
         )
     
-    return daily_aggregations
\ No newline at end of file
+    return daily_aggregations
+
+
+def prepare_stats_batch(
+    session,
+    habits: list,
+    user_id: int,
+    required_days: int,
+    end_date: date | None = None
+):
+    """
+    Prepare WeeklyStats for many habits at once over the past required_days.
+    Uses one grouped query over (habit_id, date) regardless of habit count.
+    """
+    from app.schemas import DailyAggregation, WeeklyStats
+    from datetime import timedelta
+    from app.utils.partitions import daily_totals
+    
+    if not habits:
+        return []
+    
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=required_days - 1)
+    
+    result = daily_totals(session, [h.id for h in habits], user_id, start_date, end_date)
+    totals = {(record.habit_id, record.date): record.total_minutes for record in result}
+    dates = generate_date_range(start_date, end_date)
+    
+    batch = []
+    for habit in habits:
+        daily = [
+            DailyAggregation(date=d, total_minutes=totals.get((habit.id, d), 0))
+            for d in dates
+        ]
+        total = sum(da.total_minutes for da in daily)
+        batch.append(WeeklyStats(
+            habit_id=habit.id,
+            habit_name=habit.name,
+            daily=daily,
+            total_week=total,
+            avg_per_day=round(total / required_days, 2),
+            days=required_days
+        ))
+    
+    return batch
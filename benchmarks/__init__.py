@@ -0,0 +1,2 @@
+# Benchmark suite for HT-Tracker.
+# Run with: python -m benchmarks --help
@@ -0,0 +1,116 @@
+# Synthetic dataset generator for benchmarks
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from sqlalchemy import insert, inspect, text
+from sqlmodel import SQLModel, Session
+
+from app.models import User, Habit, HabitLog
+from app.utils.security import hash_password
+from app.utils import partitions, search
+
+BENCH_PASSWORD = "benchpass"
+
+NOTE_WORDS = [
+    "morning", "evening", "focus", "tired", "great", "chapter", "run",
+    "interval", "recovery", "practice", "scales", "review", "notes",
+    "deep", "work", "stretch", "walk", "reading", "writing", "sprint",
+]
+
+
+@dataclass
+class DatasetSpec:
+    users: int = 20
+    habits_per_user: int = 5       # mean, actual is uniform in [1, 2 * mean - 1]
+    days: int = 90                 # days of history per habit
+    activity: float = 0.7          # chance a habit is logged on a given day
+    logs_per_day: int = 2          # max logs on an active day
+    note_ratio: float = 0.3        # chance a log carries a note
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    user_ids: list[int]
+    habits_by_user: dict[int, list[int]]
+    total_logs: int
+
+
+def reset_schema(engine):
+    """Drop and recreate all tables. Only ever point this at a scratch database."""
+    with engine.begin() as conn:
+        for table in partitions.archive_tables(conn):
+            conn.execute(text(f"DROP TABLE {table}"))
+        if "search_entry" in inspect(conn).get_table_names():
+            search.drop_search_index(conn)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    # Same layout as the Alembic migrations (monthly partitions / archive
+    # table, full-text index)
+    with engine.begin() as conn:
+        partitions.partition_habitlog(conn)
+        search.create_search_index(conn)
+
+
+def random_note(rng: random.Random, words: int = 8) -> str:
+    return " ".join(rng.choice(NOTE_WORDS) for _ in range(rng.randint(2, words)))
+
+
+def seed(engine, spec: DatasetSpec, batch_size: int = 5000) -> Dataset:
+    """Fill the database with users, habits and logs following spec."""
+    rng = random.Random(spec.seed)
+    # Argon2 is slow on purpose, hash once and share it
+    hashed = hash_password(BENCH_PASSWORD)
+    today = date.today()
+
+    user_ids = []
+    habits_by_user = {}
+    total_logs = 0
+
+    with Session(engine) as session:
+        for u in range(spec.users):
+            user = User(
+                username=f"bench{u}",
+                email=f"bench{u}@example.com",
+                hashed_password=hashed
+            )
+            session.add(user)
+            session.flush()
+            user_ids.append(user.id)
+
+            habit_count = rng.randint(1, max(1, 2 * spec.habits_per_user - 1))
+            habits = [
+                Habit(user_id=user.id, name=f"habit{h}", category=rng.choice(["health", "study", None]))
+                for h in range(habit_count)
+            ]
+            session.add_all(habits)
+            session.flush()
+            habits_by_user[user.id] = [h.id for h in habits]
+
+            rows = []
+            for habit in habits:
+                for d in range(spec.days):
+                    if rng.random() >= spec.activity:
+                        continue
+                    for _ in range(rng.randint(1, spec.logs_per_day)):
+                        rows.append({
+                            "habit_id": habit.id,
+                            "user_id": user.id,
+                            "date": today - timedelta(days=d),
+                            "value": rng.randint(5, 120),
+                            "note": random_note(rng) if rng.random() < spec.note_ratio else None,
+                        })
+                    if len(rows) >= batch_size:
+                        session.execute(insert(HabitLog), rows)
+                        total_logs += len(rows)
+                        rows = []
+            if rows:
+                session.execute(insert(HabitLog), rows)
+                total_logs += len(rows)
+
+        # Logs were inserted in bulk, index their notes in one pass
+        search.rebuild_index(session.connection())
+        session.commit()
+
+    return Dataset(user_ids=user_ids, habits_by_user=habits_by_user, total_logs=total_logs)
@@ -0,0 +1,150 @@
+# Drives the app in-process and collects latency / throughput / query counts
+import asyncio
+import contextvars
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from sqlalchemy import event
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+# Per-request query counter; contextvars follow the request into
+# FastAPI's threadpool, so concurrent requests are counted separately
+_query_counter: contextvars.ContextVar[list | None] = contextvars.ContextVar("query_counter", default=None)
+
+
+@dataclass
+class RouteResult:
+    route: str
+    requests: int
+    errors: int
+    throughput: float   # requests per second
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_request: float
+
+
+def install_query_counter(*engines):
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+    for engine in engines:
+        if engine is not None:
+            event.listen(engine, "before_cursor_execute", count)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_route(client, ctx, name, scenario, requests: int, concurrency: int, seed: int) -> RouteResult:
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    queries = []
+    errors = 0
+
+    # Scenario setup (e.g. rows to delete) happens before the clock starts
+    calls = await asyncio.to_thread(lambda: [scenario(ctx, rng) for _ in range(requests)])
+
+    async def one(call):
+        nonlocal errors
+        async with semaphore:
+            headers = {"Cookie": f"user_id={call.user_id}"} if call.user_id else {}
+
+            counter = [0]
+            token = _query_counter.set(counter)
+            start = time.perf_counter()
+            try:
+                response = await client.request(call.method, call.url, data=call.data, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            finally:
+                latencies.append(time.perf_counter() - start)
+                _query_counter.reset(token)
+            queries.append(counter[0])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return RouteResult(
+        route=name,
+        requests=requests,
+        errors=errors,
+        throughput=round(requests / elapsed, 2),
+        p50_ms=round(percentile(latencies, 50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 99) * 1000, 3),
+        queries_per_request=round(sum(queries) / len(queries), 2),
+    )
+
+
+async def run_all(app, ctx, scenarios: dict, requests: int, concurrency: int, seed: int) -> list[RouteResult]:
+    import httpx
+
+    # ASGITransport does not run the lifespan; without it background jobs
+    # (purges, cache warming) would run inline in the measured requests
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", follow_redirects=False) as client:
+            for i, (name, scenario) in enumerate(scenarios.items()):
+                results.append(await run_route(client, ctx, name, scenario, requests, concurrency, seed + i))
+    return results
+
+
+def format_table(results: list[RouteResult]) -> str:
+    header = f"{'route':<18}{'req':>6}{'err':>5}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.route:<18}{r.requests:>6}{r.errors:>5}{r.throughput:>10.1f}"
+            f"{r.p50_ms:>10.2f}{r.p95_ms:>10.2f}{r.p99_ms:>10.2f}{r.queries_per_request:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def save_baseline(name: str, results: list[RouteResult], meta: dict) -> Path:
+    BASELINE_DIR.mkdir(exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+    path.write_text(json.dumps({"meta": meta, "routes": [asdict(r) for r in results]}, indent=2))
+    return path
+
+
+def compare_baseline(name: str, results: list[RouteResult], threshold: float) -> list[str]:
+    """
+    Compare results against a saved baseline.
+    Returns one message per regression (p95 latency or throughput worse than
+    threshold, or more queries per request); empty means no regression.
+    """
+    baseline = json.loads((BASELINE_DIR / f"{name}.json").read_text())
+    previous = {r["route"]: r for r in baseline["routes"]}
+    regressions = []
+
+    for r in results:
+        old = previous.get(r.route)
+        if old is None:
+            continue
+        if old["p95_ms"] and r.p95_ms > old["p95_ms"] * (1 + threshold):
+            regressions.append(f"{r.route}: p95 {old['p95_ms']:.2f} -> {r.p95_ms:.2f} ms")
+        if old["throughput"] and r.throughput < old["throughput"] * (1 - threshold):
+            regressions.append(f"{r.route}: throughput {old['throughput']:.1f} -> {r.throughput:.1f} req/s")
+        if r.queries_per_request > old["queries_per_request"]:
+            regressions.append(
+                f"{r.route}: queries {old['queries_per_request']} -> {r.queries_per_request}"
+            )
+    return regressions
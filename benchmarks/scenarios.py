@@ -0,0 +1,154 @@
+# One scenario per route in app/routes/ (plus the root redirect).
+# A scenario builds a single request; any setup it needs (e.g. a row to
+# delete) happens here, outside the timed section.
+import itertools
+import random
+from dataclasses import dataclass, field
+from datetime import date
+
+from sqlmodel import Session
+
+from app.models import User, Habit, HabitLog
+from benchmarks.dataset import Dataset, BENCH_PASSWORD, NOTE_WORDS
+
+
+@dataclass
+class Call:
+    method: str
+    url: str
+    user_id: int | None = None
+    data: dict | None = None
+
+
+@dataclass
+class Context:
+    engine: object
+    dataset: Dataset
+    hashed_password: str
+    counter: itertools.count = field(default_factory=itertools.count)
+
+    def pick_user(self, rng: random.Random) -> int:
+        return rng.choice(self.dataset.user_ids)
+
+    def pick_habit(self, rng: random.Random) -> tuple[int, int]:
+        user_id = self.pick_user(rng)
+        return user_id, rng.choice(self.dataset.habits_by_user[user_id])
+
+
+def root(ctx, rng):
+    return Call("GET", "/")
+
+def login_page(ctx, rng):
+    return Call("GET", "/user/login")
+
+def register_page(ctx, rng):
+    return Call("GET", "/user/register")
+
+def register(ctx, rng):
+    n = next(ctx.counter)
+    return Call("POST", "/user/register/form", data={
+        "username": f"newuser{n}", "email": f"newuser{n}@example.com", "password": "pw"
+    })
+
+def login(ctx, rng):
+    n = rng.randrange(len(ctx.dataset.user_ids))
+    return Call("POST", "/user/login/form", data={
+        "email": f"bench{n}@example.com", "password": BENCH_PASSWORD
+    })
+
+def account(ctx, rng):
+    user_id = ctx.pick_user(rng)
+    return Call("GET", f"/{user_id}/account", user_id)
+
+def logout(ctx, rng):
+    return Call("POST", "/logout", ctx.pick_user(rng))
+
+def habits(ctx, rng):
+    return Call("GET", "/habits", ctx.pick_user(rng))
+
+def habit_form_guard(ctx, rng):
+    return Call("GET", "/habit/form", ctx.pick_user(rng))
+
+def create_habit(ctx, rng):
+    return Call("POST", "/habit/form", ctx.pick_user(rng), {"name": f"new{next(ctx.counter)}"})
+
+def habit_logs(ctx, rng):
+    user_id, habit_id = ctx.pick_habit(rng)
+    return Call("GET", f"/habits/{habit_id}/log", user_id)
+
+def habit_stats(ctx, rng):
+    user_id, habit_id = ctx.pick_habit(rng)
+    return Call("GET", f"/habits/{habit_id}/stats", user_id)
+
+def habit_stats_batch(ctx, rng):
+    return Call("GET", "/habits/stats?days=30", ctx.pick_user(rng))
+
+def search(ctx, rng):
+    return Call("GET", f"/search?q={rng.choice(NOTE_WORDS)}", ctx.pick_user(rng))
+
+def create_log(ctx, rng):
+    user_id, habit_id = ctx.pick_habit(rng)
+    return Call("POST", f"/habits/{habit_id}/form", user_id, {"value": rng.randint(5, 60), "note": "bench"})
+
+def delete_log(ctx, rng):
+    user_id, habit_id = ctx.pick_habit(rng)
+    with Session(ctx.engine) as session:
+        log = HabitLog(habit_id=habit_id, user_id=user_id, date=date.today(), value=10)
+        session.add(log)
+        session.commit()
+        log_id = log.id
+    return Call("POST", f"/logs/{log_id}/delete", user_id)
+
+def delete_habit(ctx, rng):
+    user_id = ctx.pick_user(rng)
+    with Session(ctx.engine) as session:
+        habit = Habit(user_id=user_id, name=f"doomed{next(ctx.counter)}")
+        session.add(habit)
+        session.flush()
+        session.add_all([
+            HabitLog(habit_id=habit.id, user_id=user_id, date=date.today(), value=10)
+            for _ in range(10)
+        ])
+        session.commit()
+        habit_id = habit.id
+    return Call("POST", f"/habits/{habit_id}/delete", user_id)
+
+def delete_user(ctx, rng):
+    n = next(ctx.counter)
+    with Session(ctx.engine) as session:
+        user = User(username=f"doomed{n}", email=f"doomed{n}@example.com", hashed_password=ctx.hashed_password)
+        session.add(user)
+        session.flush()
+        for h in range(3):
+            habit = Habit(user_id=user.id, name=f"h{h}")
+            session.add(habit)
+            session.flush()
+            session.add_all([
+                HabitLog(habit_id=habit.id, user_id=user.id, date=date.today(), value=10)
+                for _ in range(10)
+            ])
+        session.commit()
+        user_id = user.id
+    return Call("POST", "/delete", user_id)
+
+
+SCENARIOS = {
+    "root": root,
+    "login_page": login_page,
+    "register_page": register_page,
+    "register": register,
+    "login": login,
+    "account": account,
+    "logout": logout,
+    "habits": habits,
+    "habit_form_guard": habit_form_guard,
+    "create_habit": create_habit,
+    "habit_logs": habit_logs,
+    "habit_stats": habit_stats,
+    "habit_stats_batch": habit_stats_batch,
+    "search": search,
+    "create_log": create_log,
+    "delete_log": delete_log,
+    "delete_habit": delete_habit,
+    "delete_user": delete_user,
+}
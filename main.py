@@ -7,8 +7,19 @@ from fastapi.responses import RedirectResponse
 
 templates = Jinja2Templates(directory="app/templates")
 
+from contextlib import asynccontextmanager
+from app.utils.jobs import scheduler
+from app import tasks  # registers background tasks
+
+# Start/stop background workers with the app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await scheduler.start()
+    yield
+    await scheduler.stop()
+
 # Create a FastAPI Instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 from fastapi.staticfiles import StaticFiles
@@ -17,6 +28,28 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
 
+from fastapi import Request
+from app.database import read_engine, mark_primary_sticky
+
+# Pin clients to the primary for a moment after any write,
+# so read-only routes on the replica never miss their own changes
+@app.middleware("http")
+async def primary_after_write(request: Request, call_next):
+    response = await call_next(request)
+    if read_engine is not None and request.method == "POST":
+        mark_primary_sticky(response)
+    return response
+
+
+from app.utils.profiling import profiler
+
+# Opt-in tracemalloc/cProfile profiling (X-Profile header or sample rate),
+# results under /debug/profiling
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    return await profiler(request, call_next)
+
+
 # Root route redirects to login
 @app.get("/", include_in_schema=False)
 def root():
@@ -35,6 +68,14 @@ from app.routes.user import router as user_router
 app.include_router(user_router)
 
 
+from app.routes.search import router as search_router
+app.include_router(search_router)
+
+
+from app.routes.debug import router as debug_router
+app.include_router(debug_router)
+
+
 # Run the FastAPI server
 def main():
     uvicorn.run("main:app", host="localhost", port=8000, reload=True)